@@ -0,0 +1,71 @@
+"""
+Checks that the lxml extractor returns exactly what the BeautifulSoup path returns
+on every fixture, and times both.
+
+    python benchmarks/compare_extractors.py [--rounds 20]
+
+Fixtures: the synthetic pages for every sign and day -1/0/+1, any saved live pages
+(fixtures/live) and the hand-written edge cases (fixtures/edge_cases/<name>__<sign>.html).
+Exits with status 1 on the first mismatch.
+"""
+import os
+import sys
+import time
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "horoscope_bot"))
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import FIXTURES_DIR, build_page  # noqa: E402
+
+EDGE_CASES_DIR = os.path.join(FIXTURES_DIR, "edge_cases")
+
+
+def load_fixtures():
+    from scraper import ZODIAC_SIGNS
+
+    fixtures = []
+    for day in (-1, 0, 1):
+        for sign in ZODIAC_SIGNS:
+            fixtures.append((f"{sign}_{day}", sign, build_page(sign, day)))
+    for filename in sorted(os.listdir(EDGE_CASES_DIR)):
+        name, _, sign = os.path.splitext(filename)[0].partition("__")
+        with open(os.path.join(EDGE_CASES_DIR, filename), "rb") as f:
+            fixtures.append((name, sign, f.read()))
+    return fixtures
+
+
+def time_extractor(extractor, fixtures, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for _, sign, content in fixtures:
+            extractor(content, sign)
+    return (time.perf_counter() - started) / (rounds * len(fixtures)) * 1000
+
+
+def main():
+    from extractor import extract_bs4, extract_lxml
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    for name, sign, content in fixtures:
+        expected = extract_bs4(content, sign)
+        actual = extract_lxml(content, sign)
+        if expected != actual:
+            print(f"MISMATCH on {name}:\n  bs4:  {expected!r}\n  lxml: {actual!r}")
+            return 1
+    print(f"Identical output on {len(fixtures)} fixture(s).")
+
+    bs4_ms = time_extractor(extract_bs4, fixtures, args.rounds)
+    lxml_ms = time_extractor(extract_lxml, fixtures, args.rounds)
+    print(f"bs4:  {bs4_ms:.3f} ms/page")
+    print(f"lxml: {lxml_ms:.3f} ms/page ({bs4_ms / lxml_ms:.1f}x faster)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
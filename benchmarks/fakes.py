@@ -0,0 +1,238 @@
+"""
+Offline stand-ins for everything the bot talks to: the astrology.com.au pages,
+the translation provider and the Telegram Bot API.
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+import threading
+from datetime import date, timedelta
+from string import Template
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Saved live pages, named <sign>_<day>.html (see save_fixtures.py)
+LIVE_FIXTURES_DIR = os.path.join(FIXTURES_DIR, "live")
+
+# Day offset 0 of the synthetic site is the real today, so storage retention behaves as in production
+BASE_DATE = date.today()
+
+WORDS = (
+    "moon venus mercury energy focus partner career money home family friends plans "
+    "patience confidence change opportunity balance creative project conversation trust "
+    "today tomorrow week decision heart mind journey growth feelings chance"
+).split()
+
+
+def site_date(day: int) -> str:
+    """Date heading the synthetic site shows for a day offset, e.g. '14 January 2026'."""
+    d = BASE_DATE + timedelta(days=day)
+    return f"{d.day} {d:%B %Y}"
+
+
+def _sentences(rng, count):
+    sentences = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(10, 18))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def build_page(sign: str, day: int) -> bytes:
+    """
+    A page shaped like the real one (same selectors, similar size), with text that is
+    deterministic per (sign, day) so every day offset renders differently.
+    """
+    live_path = os.path.join(LIVE_FIXTURES_DIR, f"{sign}_{day}.html")
+    if os.path.exists(live_path):
+        with open(live_path, "rb") as f:
+            return f.read()
+
+    rng = random.Random(f"{sign}:{day}")
+    with open(os.path.join(FIXTURES_DIR, "horoscope_page.html"), "r", encoding="utf-8") as f:
+        template = Template(f.read())
+    teaser = '<div class="teaser"><a href="/article/{0}"><img src="/img/{0}.jpg" alt=""><h5>{1}</h5></a><p>{2}</p></div>'
+    filler = "\n".join(teaser.format(i, _sentences(rng, 1), _sentences(rng, 2)) for i in range(60))
+    sidebar_filler = "\n".join(teaser.format(100 + i, _sentences(rng, 1), _sentences(rng, 1)) for i in range(30))
+    html = template.substitute(
+        sign=sign,
+        sign_title=sign.title(),
+        date=site_date(day),
+        paragraph1=_sentences(rng, 5),
+        paragraph2=_sentences(rng, 4),
+        summary=_sentences(rng, 3),
+        filler=filler,
+        sidebar_filler=sidebar_filler,
+    )
+    return html.encode("utf-8")
+
+
+class FixtureServer:
+    """
+    Local HTTP stand-in for astrology.com.au serving /horoscopes/daily-horoscopes/<sign>?day=N.
+    `latency` adds a fixed per-request delay to approximate the real round trip.
+    """
+
+    PATH_PREFIX = "/horoscopes/daily-horoscopes/"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def page(self, sign, day):
+        with self._lock:
+            if (sign, day) not in self._pages:
+                self._pages[(sign, day)] = build_page(sign, day)
+            return self._pages[(sign, day)]
+
+    def start(self) -> str:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if not parsed.path.startswith(server.PATH_PREFIX):
+                    self.send_error(404)
+                    return
+                sign = parsed.path[len(server.PATH_PREFIX):].strip("/")
+                day = int(parse_qs(parsed.query).get("day", ["0"])[0])
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.page(sign, day)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://127.0.0.1:{self._server.server_port}{self.PATH_PREFIX.rstrip('/')}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def make_fake_translator(latency: float = 0.0):
+    """A translator backend that tags the text instead of calling a provider."""
+    from translator import TranslatorBackend
+
+    class FakeTranslator(TranslatorBackend):
+        name = "fake"
+
+        def __init__(self):
+            self.calls = 0
+
+        def translate_many(self, texts, source, target):
+            # One simulated provider round trip per batch, like a chunked request
+            self.calls += 1
+            if latency:
+                time.sleep(latency)
+            return [f"[{target}] {text}" for text in texts]
+
+    return FakeTranslator()
+
+
+class FakeBot:
+    """
+    Records Bot API calls. Uploads take `latency` plus size / `upload_bytes_per_second`,
+    file_id resends only `latency`. `first_photo_at` is when a photo first reached a user,
+    so pre-uploads to `cache_chat_id` do not count.
+    """
+
+    def __init__(self, latency: float = 0.05, upload_bytes_per_second: float = 4 * 1024 * 1024, cache_chat_id=None):
+        self.latency = latency
+        self.upload_bytes_per_second = upload_bytes_per_second
+        self.cache_chat_id = cache_chat_id
+        self.calls = []
+        self.first_photo_at = None
+
+    def _record_photo(self, chat_id):
+        if self.first_photo_at is None and str(chat_id) != str(self.cache_chat_id):
+            self.first_photo_at = time.perf_counter()
+
+    def _uploaded_bytes(self, media):
+        content = getattr(media, "input_file_content", None)
+        if content is None and hasattr(media, "read"):
+            content = media.read()
+        return len(content) if content else 0
+
+    def _photo_message(self):
+        return SimpleNamespace(
+            message_id=len(self.calls),
+            photo=[SimpleNamespace(file_id=f"fake-{uuid.uuid4().hex}")],
+        )
+
+    async def _transfer(self, size):
+        await asyncio.sleep(self.latency + size / self.upload_bytes_per_second)
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        size = sum(self._uploaded_bytes(item.media) for item in media)
+        await self._transfer(size)
+        self.calls.append(("send_media_group", len(media), size))
+        self._record_photo(chat_id)
+        return [self._photo_message() for _ in media]
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        size = self._uploaded_bytes(photo)
+        await self._transfer(size)
+        self.calls.append(("send_photo", 1, size))
+        self._record_photo(chat_id)
+        return self._photo_message()
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("delete_messages", len(message_ids), 0))
+        return True
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("send_message", 0, 0))
+        return SimpleNamespace(message_id=len(self.calls), chat_id=chat_id, text=text, edit_text=self._edit)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return await self._edit(text, **kwargs)
+
+    async def _edit(self, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("edit_message_text", 0, 0))
+        return True
+
+
+def make_callback_update(bot: FakeBot, data: str, chat_id: int = 1):
+    """The slice of telegram.Update that button_handler touches."""
+    async def answer(*args, **kwargs):
+        return True
+
+    async def edit_message_text(text, **kwargs):
+        return await bot.edit_message_text(text, chat_id=chat_id, **kwargs)
+
+    async def reply_text(text, **kwargs):
+        return await bot.send_message(chat_id, text, **kwargs)
+
+    message = SimpleNamespace(chat_id=chat_id, message_id=1, reply_text=reply_text)
+    query = SimpleNamespace(data=data, answer=answer, edit_message_text=edit_message_text, message=message)
+    return SimpleNamespace(callback_query=query, effective_chat=SimpleNamespace(id=chat_id))
+
+
+def make_context(bot: FakeBot, user_data: dict):
+    return SimpleNamespace(bot=bot, user_data=user_data)
@@ -0,0 +1,409 @@
+"""
+Offline end-to-end benchmarks for the horoscope bot.
+
+Everything external is replaced: pages come from a local HTTP stand-in serving
+fixtures (benchmarks/fixtures), translation from a fake backend, Telegram from a
+fake Bot, and storage is a throwaway SQLite file. Each stage runs in its own
+process and reports p50/p95/p99 latency, throughput and that process's peak RSS,
+and is compared with benchmarks/baseline.json when it exists.
+
+    python benchmarks/run_benchmarks.py                    # run + compare with the baseline
+    python benchmarks/run_benchmarks.py --save-baseline    # record a new baseline
+    python benchmarks/run_benchmarks.py --stages parse scrape --iterations 50
+
+Exits with status 1 when a stage's p95 is slower than the baseline by more than
+--tolerance (default 25%) or its throughput dropped by more than that.
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import subprocess
+import resource
+import tempfile
+import importlib.util
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BOT_DIR = os.path.join(ROOT_DIR, "horoscope_bot")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+sys.path.insert(0, BOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+STAGES = ("parse", "parse_bs4", "scrape", "translate", "render_pillow", "render_playwright", "upload", "button_flow")
+
+# Stages that need far more wall time per iteration run fewer of them by default
+DEFAULT_ITERATIONS = {
+    "parse": 200,
+    "parse_bs4": 200,
+    "scrape": 10,
+    "translate": 50,
+    "render_pillow": 10,
+    "render_playwright": 10,
+    "upload": 30,
+    "button_flow": 10,
+}
+
+
+def _isolate_environment(workdir, engine, cache_chat_id=None):
+    """Points every stateful subsystem at a scratch directory before the bot modules are imported."""
+    os.environ.update({
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(workdir, "bench.db"),
+        "MONGO_URI": "",
+        "TRANSLATION_MEMORY_PATH": os.path.join(workdir, "translation_memory.json"),
+        "RENDER_CACHE_DIR": os.path.join(workdir, "render_cache"),
+        "RENDER_CACHE_GRIDFS": "false",
+        "SCHEDULER_STATE_PATH": os.path.join(workdir, "scheduler_state.json"),
+        "SCRAPE_RETRIES": "0",
+        "CACHE_CHAT_ID": cache_chat_id or "",
+    })
+    if engine:
+        os.environ["RENDER_ENGINE"] = engine
+
+
+def _percentile(ordered, pct):
+    # Nearest-rank percentile
+    if not ordered:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def _peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return round(usage / scale, 1), round(children / scale, 1)
+
+
+def summarize(samples_ms, ops_per_iteration, wall_seconds):
+    ordered = sorted(samples_ms)
+    rss, children_rss = _peak_rss_mb()
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(_percentile(ordered, 50), 2),
+        "p95_ms": round(_percentile(ordered, 95), 2),
+        "p99_ms": round(_percentile(ordered, 99), 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "throughput_ops_s": round(len(ordered) * ops_per_iteration / wall_seconds, 2) if wall_seconds else 0.0,
+        "ops_per_iteration": ops_per_iteration,
+        "peak_rss_mb": rss,
+        "peak_child_rss_mb": children_rss,
+    }
+
+
+def measure(fn, iterations, warmup=1, ops_per_iteration=1):
+    """Calls fn(i) `warmup` times untimed, then `iterations` times timed."""
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return summarize(samples, ops_per_iteration, time.perf_counter() - started)
+
+
+class Bench:
+    """Holds the stand-ins and the event loop shared by all stages."""
+
+    def __init__(self, args):
+        from fakes import FixtureServer, FakeBot, make_fake_translator
+        import scraper
+        import translator
+
+        self.args = args
+        self.loop = asyncio.new_event_loop()
+        self.server = FixtureServer(latency=args.site_latency)
+        scraper.BASE_URL = self.server.start()
+        translator._backend = make_fake_translator(latency=args.translate_latency)
+        self.make_bot = lambda: FakeBot(
+            latency=args.telegram_latency, upload_bytes_per_second=args.upload_bandwidth, cache_chat_id=args.cache_chat_id
+        )
+        self.readings = self.run(scraper.scrape_offset_async(0))
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def unique_readings(self, i):
+        # A marker per iteration keeps the render cache and translation memory cold
+        return [dict(r, text=f"{r['text']} (#{i})") for r in self.readings]
+
+    def close(self):
+        import scraper
+        from render_pool import shutdown_render_pool
+        self.run(scraper.close_async_client())
+        self.loop.close()
+        self.server.stop()
+        shutdown_render_pool()
+
+    # --- stages -------------------------------------------------------------------------
+
+    def bench_parse(self, iterations):
+        from scraper import ZODIAC_SIGNS, _parse_horoscope
+        pages = [(sign, self.server.page(sign, 0)) for sign in ZODIAC_SIGNS]
+
+        def parse(i):
+            sign, content = pages[i % len(pages)]
+            _parse_horoscope(sign, 0, content)
+        return measure(parse, iterations)
+
+    def bench_parse_bs4(self, iterations):
+        """The original BeautifulSoup extraction, for comparison with `parse`."""
+        from scraper import ZODIAC_SIGNS
+        from extractor import extract_bs4
+        pages = [(sign, self.server.page(sign, 0)) for sign in ZODIAC_SIGNS]
+
+        def parse(i):
+            sign, content = pages[i % len(pages)]
+            extract_bs4(content, sign)
+        return measure(parse, iterations)
+
+    def bench_scrape(self, iterations):
+        import scraper
+
+        def scrape(i):
+            scraper._conditional_cache.clear()
+            self.run(scraper.scrape_offsets_async((-1, 0, 1)))
+        return measure(scrape, iterations, ops_per_iteration=36)
+
+    def bench_translate(self, iterations):
+        from translator import translate_batch
+
+        def translate(i):
+            translate_batch([r["text"] for r in self.unique_readings(i)], source="en", target="te")
+        return measure(translate, iterations, ops_per_iteration=12)
+
+    def _bench_render(self, iterations, engine):
+        from image_generator import generate_horoscope_images
+
+        def render(i):
+            generate_horoscope_images(
+                self.unique_readings(i), self.readings[0]["date"], template_id="1", engine=engine, output="bytes"
+            )
+        return measure(render, iterations, ops_per_iteration=6)
+
+    def bench_render_pillow(self, iterations):
+        return self._bench_render(iterations, "pillow")
+
+    def bench_render_playwright(self, iterations):
+        if importlib.util.find_spec("playwright") is None:
+            return None
+        return self._bench_render(iterations, "playwright")
+
+    def bench_upload(self, iterations):
+        from image_generator import generate_horoscope_images
+        from album_cache import upload_album
+        images = generate_horoscope_images(self.readings, self.readings[0]["date"], output="bytes")
+        bot = self.make_bot()
+
+        def upload(i):
+            self.run(upload_album(bot, images, chat_id=1))
+        return measure(upload, iterations, ops_per_iteration=len(images))
+
+    def bench_button_flow(self, iterations):
+        """
+        The full cold path behind the language button: album cache miss, scrape,
+        render and upload. Every iteration asks for a different day so nothing is cached.
+        Also reports time to the first photo reaching the user (cache chat pre-uploads excluded).
+        """
+        from fakes import make_callback_update, make_context, site_date
+        from main import button_handler
+
+        first_image_ms = []
+
+        def flow(i):
+            day = 1000 + i
+            target_date = site_date(day)
+            bot = self.make_bot()
+            update = make_callback_update(bot, f"lang_{self.args.language}")
+            context = make_context(bot, {
+                "selected_template": self.args.template,
+                "selected_date": target_date,
+                "date_offsets": {target_date: day},
+            })
+            started = time.perf_counter()
+            self.run(button_handler(update, context))
+            if bot.first_photo_at is None:
+                raise RuntimeError(f"button_handler sent no photos for {target_date}: {bot.calls}")
+            if i >= 0:
+                first_image_ms.append((bot.first_photo_at - started) * 1000)
+
+        result = measure(flow, iterations, ops_per_iteration=1)
+        ordered = sorted(first_image_ms)
+        result["first_image_p50_ms"] = round(_percentile(ordered, 50), 2)
+        result["first_image_p95_ms"] = round(_percentile(ordered, 95), 2)
+        return result
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions."""
+    regressions = []
+    for stage, current in results.items():
+        previous = (baseline or {}).get("stages", {}).get(stage)
+        if not current or not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous["throughput_ops_s"] and current["throughput_ops_s"] < previous["throughput_ops_s"] * (1 - tolerance):
+            regressions.append(f"{stage}: throughput {previous['throughput_ops_s']} -> {current['throughput_ops_s']} ops/s")
+    return regressions
+
+
+def _fixture_set():
+    from fakes import LIVE_FIXTURES_DIR
+    if os.path.isdir(LIVE_FIXTURES_DIR) and any(name.endswith(".html") for name in os.listdir(LIVE_FIXTURES_DIR)):
+        return "live"
+    return "synthetic"
+
+
+def mismatched_conditions(report, baseline):
+    """Settings that differ from the baseline's; their numbers are not directly comparable."""
+    ignored = ("stages", "iterations", "tolerance")
+    current = {k: v for k, v in report["settings"].items() if k not in ignored}
+    previous = {k: v for k, v in baseline.get("settings", {}).items() if k not in ignored}
+    current.update(engine=report["engine"], fixtures=report["fixtures"])
+    previous.update(engine=baseline.get("engine"), fixtures=baseline.get("fixtures"))
+    return [f"{key}: {previous.get(key)!r} -> {value!r}" for key, value in current.items() if previous.get(key) != value]
+
+
+def print_table(results, baseline):
+    header = f"{'stage':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'RSS MB':>9}{'base p95':>10}"
+    print(header)
+    print("-" * len(header))
+    for stage, r in results.items():
+        if r is None:
+            print(f"{stage:<18}{'skipped (dependency missing)':>40}")
+            continue
+        base = (baseline or {}).get("stages", {}).get(stage) or {}
+        base_p95 = f"{base['p95_ms']:.1f}" if base else "-"
+        print(f"{stage:<18}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{r['throughput_ops_s']:>10.1f}{r['peak_rss_mb']:>9.1f}{base_p95:>10}")
+        if "first_image_p50_ms" in r:
+            print(f"{'  first image':<18}{r['first_image_p50_ms']:>10.1f}{r['first_image_p95_ms']:>10.1f}")
+
+
+def run_stage(args, stage, engine):
+    """Runs one stage in this process against fresh stand-ins and scratch storage."""
+    workdir = tempfile.mkdtemp(prefix="horoscope_bench_")
+    _isolate_environment(workdir, engine, args.cache_chat_id)
+
+    import logging
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    bench = Bench(args)
+    try:
+        return getattr(bench, f"bench_{stage}")(args.iterations or DEFAULT_ITERATIONS[stage])
+    finally:
+        bench.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_stage_in_child(stage, argv):
+    """
+    Runs one stage in a fresh interpreter. ru_maxrss is a process-lifetime peak, so in a
+    shared process every stage would report the highest peak of the stages before it.
+    """
+    with tempfile.TemporaryDirectory(prefix="horoscope_bench_stage_") as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *argv, "--stages", stage, "--stage-result", result_path],
+            check=True,
+        )
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--iterations", type=int, help="override the per-stage iteration counts")
+    parser.add_argument("--engine", choices=("playwright", "pillow"), help="render engine for upload/button_flow")
+    parser.add_argument("--template", default="1")
+    parser.add_argument("--language", default="english", choices=("english", "telugu"))
+    parser.add_argument("--site-latency", type=float, default=0.05, help="seconds per fixture page request")
+    parser.add_argument("--translate-latency", type=float, default=0.3, help="seconds per translation batch")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per Bot API call")
+    parser.add_argument("--upload-bandwidth", type=float, default=4 * 1024 * 1024, help="upload bytes per second")
+    parser.add_argument("--cache-chat-id", help="pre-upload pages to this (fake) chat while the album renders")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="also write the results JSON here")
+    # Internal: run the single stage in --stages in this process and write its result here
+    parser.add_argument("--stage-result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    engine = args.engine
+    if engine is None and importlib.util.find_spec("playwright") is None:
+        engine = "pillow"
+
+    if args.stage_result:
+        with open(args.stage_result, "w", encoding="utf-8") as f:
+            json.dump(run_stage(args, args.stages[0], engine), f)
+        return 0
+
+    results = {}
+    for stage in args.stages:
+        iterations = args.iterations or DEFAULT_ITERATIONS[stage]
+        print(f"Running {stage} x{iterations}...", flush=True)
+        results[stage] = run_stage_in_child(stage, sys.argv[1:])
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print()
+    print_table(results, baseline)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "engine": engine or "per-template",
+        "fixtures": _fixture_set(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "output", "stage_result")},
+        "stages": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print("\nNo baseline yet; run with --save-baseline to record one.")
+        return 0
+
+    mismatched = mismatched_conditions(report, baseline)
+    if mismatched:
+        print(f"\nWarning: {args.baseline} was recorded under different conditions:")
+        for line in mismatched:
+            print(f"  - {line}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Captures the live astrology.com.au pages into benchmarks/fixtures/live/ so the
+benchmarks parse real markup. The stand-in server prefers these over the
+synthetic pages whenever a <sign>_<day>.html file exists.
+
+    python benchmarks/save_fixtures.py [--days -1 0 1]
+"""
+import os
+import sys
+import argparse
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "horoscope_bot"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import LIVE_FIXTURES_DIR  # noqa: E402
+
+
+def main():
+    from scraper import ZODIAC_SIGNS, HEADERS, horoscope_url
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[-1, 0, 1])
+    args = parser.parse_args()
+
+    os.makedirs(LIVE_FIXTURES_DIR, exist_ok=True)
+    for day in args.days:
+        for sign in ZODIAC_SIGNS:
+            request = urllib.request.Request(horoscope_url(sign, day), headers=HEADERS)
+            with urllib.request.urlopen(request, timeout=30) as response:
+                body = response.read()
+            path = os.path.join(LIVE_FIXTURES_DIR, f"{sign}_{day}.html")
+            with open(path, "wb") as f:
+                f.write(body)
+            print(f"Saved {path} ({len(body)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
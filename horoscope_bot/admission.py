@@ -0,0 +1,168 @@
+import os
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Raised when a gate's waiting queue is full; callers should shed the request."""
+
+    def __init__(self, gate_name: str):
+        super().__init__(f"{gate_name} queue is full")
+        self.gate_name = gate_name
+
+
+class Gate:
+    """
+    Admission control for one subsystem: at most `limit` callers inside at once and at
+    most `max_queue` waiting, first come first served. Anyone beyond that is rejected
+    with Overloaded instead of piling more work onto a saturated subsystem.
+
+    Usable from coroutines (`slot_async`) and plain threads (`slot`), like SingleFlight,
+    because waiters block on a concurrent.futures.Future.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _enter(self):
+        """Takes a slot and returns None, or returns the Future to wait on, or raises Overloaded."""
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.name)
+            future = Future()
+            self._waiters.append(future)
+            self.queued += 1
+            return future
+
+    def _abandon(self, future):
+        """A waiter gave up. If its slot was already handed over, pass it on."""
+        with self._lock:
+            try:
+                self._waiters.remove(future)
+                return
+            except ValueError:
+                pass
+            # release() already popped it: it either granted the slot (result True) or,
+            # the future having been cancelled, skipped it and freed the slot itself
+            holds_slot = future.done() and not future.cancelled() and future.result() is True
+        if holds_slot:
+            self.release()
+
+    def position(self, future) -> int:
+        with self._lock:
+            try:
+                return self._waiters.index(future) + 1
+            except ValueError:
+                return 0
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                future = self._waiters.popleft()
+                # The slot moves straight to the next waiter, so _active is unchanged
+                if future.set_running_or_notify_cancel():
+                    self.admitted += 1
+                    future.set_result(True)
+                    return
+            self._active -= 1
+
+    @asynccontextmanager
+    async def slot_async(self, on_queued=None):
+        """
+        `async with gate.slot_async(on_queued=cb):` — `cb(position)` is awaited once
+        if the caller has to wait for a slot.
+        """
+        future = self._enter()
+        if future is not None:
+            if on_queued is not None:
+                try:
+                    await on_queued(self.position(future))
+                except Exception as e:
+                    logger.warning(f"[{self.name}] Queue notification failed: {e}")
+            try:
+                await asyncio.wrap_future(future)
+            except BaseException:
+                self._abandon(future)
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def slot(self, timeout: float = None):
+        """Blocking variant for worker threads (scheduler, to_thread bodies)."""
+        future = self._enter()
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except BaseException:
+                self._abandon(future)
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "waiting": len(self._waiters),
+                "limit": self.limit,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+            }
+
+
+# name -> (default limit, default queue size); overridable as ADMISSION_<NAME>_LIMIT / _QUEUE
+GATE_DEFAULTS = {
+    # Whole user album requests (data + render) past the file_id cache
+    "album": (4, 50),
+    # Website scrapes of one or more offsets
+    "scrape": (2, 20),
+    # Translation batches
+    "translate": (2, 20),
+    # Album renders; each one fans out over the shared Chromium pool
+    "render": (2, 20),
+}
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(name: str) -> Gate:
+    with _gates_lock:
+        gate = _gates.get(name)
+        if gate is None:
+            limit, max_queue = GATE_DEFAULTS.get(name, (1, 0))
+            limit = int(os.getenv(f"ADMISSION_{name.upper()}_LIMIT", str(limit)))
+            max_queue = int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", str(max_queue)))
+            gate = _gates[name] = Gate(name, limit, max_queue)
+        return gate
+
+
+def admission_stats() -> dict:
+    with _gates_lock:
+        return {name: gate.stats() for name, gate in _gates.items()}
@@ -0,0 +1,177 @@
+import io
+import os
+import time
+import asyncio
+import logging
+from telegram import InputMediaPhoto
+from metrics import span, observe
+
+logger = logging.getLogger(__name__)
+
+# Minimum gap between progress edits of the status message (Telegram rate-limits edits)
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "1.5"))
+# Pages pre-uploaded to the cache chat at the same time while the rest of the album renders
+PAGE_UPLOAD_CONCURRENCY = int(os.getenv("PAGE_UPLOAD_CONCURRENCY", "2"))
+
+
+def cache_chat_id():
+    """
+    Private chat/channel the scheduler uploads pre-rendered albums to, so their
+    Telegram file_ids can be resent to users without another upload. Live requests also
+    pre-upload pages there while the rest of the album renders, at the cost of one extra
+    upload per page; those messages are deleted once the album is sent. Unset (the
+    default) disables both.
+    """
+    return os.getenv("CACHE_CHAT_ID") or None
+
+
+async def upload_album(bot, images, chat_id, **kwargs) -> list:
+    """
+    Sends the rendered pages as one media group and returns the file_id of each photo
+    (largest size), in page order.
+    """
+    media_group = []
+    for image in images:
+        image.seek(0)
+        media_group.append(InputMediaPhoto(image, filename=image.name))
+    messages = await bot.send_media_group(chat_id=chat_id, media=media_group, **kwargs)
+    return [m.photo[-1].file_id for m in messages if m.photo]
+
+
+async def upload_photo(bot, image, chat_id, **kwargs):
+    """Sends one page and returns the sent message."""
+    image.seek(0)
+    return await bot.send_photo(chat_id=chat_id, photo=image, **kwargs)
+
+
+async def delete_messages(bot, chat_id, messages):
+    """Best-effort cleanup of pre-upload messages so the cache chat does not grow per request."""
+    message_ids = [m.message_id for m in messages]
+    if not message_ids:
+        return
+    try:
+        await bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+    except Exception as e:
+        logger.warning(f"Could not delete {len(message_ids)} pre-uploaded page(s) from the cache chat: {e}")
+
+
+class ProgressReporter:
+    """
+    Keeps a status message up to date without tripping Telegram's edit limits:
+    unchanged text is skipped and edits are at least PROGRESS_EDIT_INTERVAL apart
+    unless forced. Failed edits are logged and ignored.
+    """
+
+    def __init__(self, edit, interval: float = PROGRESS_EDIT_INTERVAL):
+        self._edit = edit
+        self.interval = interval
+        self._last_text = None
+        self._last_at = 0.0
+
+    async def update(self, text: str, force: bool = False):
+        now = time.monotonic()
+        if text == self._last_text or (not force and now - self._last_at < self.interval):
+            return
+        self._last_text = text
+        self._last_at = now
+        try:
+            await self._edit(text)
+        except Exception as e:
+            logger.debug(f"Progress edit skipped: {e}")
+
+
+async def deliver_album(bot, chat_id, render, page_count: int, progress: ProgressReporter = None, progress_text=None) -> list:
+    """
+    Renders and sends an album, streaming progress as each page lands.
+
+    `render(on_page=...)` is the blocking album render (generate_horoscope_images with
+    output="bytes"); it runs in a thread and reports every page as it lands.
+
+    Rendering and uploading only overlap when CACHE_CHAT_ID is set: each finished page is
+    uploaded there while the next ones render, and the user then gets the usual single
+    media group by file_id; the pre-upload messages are deleted afterwards. Telegram has
+    no upload-only call, so without a cache chat the album is uploaded once every page
+    has rendered and only the progress text streams. Either way the final album is the
+    same media group. Returns the file_ids of the photos the user received, in page order.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    ready = asyncio.Queue()
+
+    def on_page(idx, jpeg_bytes):
+        # Called from render threads
+        loop.call_soon_threadsafe(ready.put_nowait, (idx, jpeg_bytes))
+
+    render_task = asyncio.create_task(asyncio.to_thread(render, on_page=on_page))
+    cache_chat = cache_chat_id()
+    semaphore = asyncio.Semaphore(max(1, PAGE_UPLOAD_CONCURRENCY))
+    buffers = {}
+    uploads = {}
+
+    async def preupload(buffer):
+        async with semaphore:
+            with span("upload_page"):
+                return await upload_photo(bot, buffer, cache_chat, disable_notification=True)
+
+    def accept(idx, jpeg_bytes):
+        if idx in buffers:
+            return False
+        if not buffers:
+            observe("album_first_page_rendered", time.perf_counter() - started)
+        buffer = io.BytesIO(jpeg_bytes)
+        buffer.name = f"horoscope_{idx + 1}.jpg"
+        buffers[idx] = buffer
+        if cache_chat:
+            uploads[idx] = asyncio.create_task(preupload(buffer))
+        return True
+
+    getter = None
+    try:
+        while not render_task.done():
+            getter = getter or asyncio.create_task(ready.get())
+            done, _ = await asyncio.wait({getter, render_task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                idx, jpeg_bytes = getter.result()
+                getter = None
+                if accept(idx, jpeg_bytes) and progress is not None:
+                    text = progress_text(len(buffers), page_count) if progress_text else f"Rendered page {len(buffers)}/{page_count} 📸"
+                    await progress.update(text)
+        images = await render_task
+    except BaseException:
+        for task in uploads.values():
+            task.cancel()
+        # Pages that already reached the cache chat would otherwise stay there for good
+        sent = [t.result() for t in uploads.values() if t.done() and not t.cancelled() and t.exception() is None]
+        if sent:
+            asyncio.create_task(delete_messages(bot, cache_chat, sent))
+        raise
+    finally:
+        if getter is not None:
+            getter.cancel()
+
+    # Pages whose callbacks had not arrived yet (or a render joined from another request)
+    for idx, image in enumerate(images):
+        accept(idx, image.getvalue())
+    ordered = [buffers[idx] for idx in range(len(images))]
+
+    if uploads:
+        results = await asyncio.gather(*(uploads[idx] for idx in range(len(images))), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        preuploaded = [r for r in results if not isinstance(r, BaseException)]
+        try:
+            if not failures:
+                with span("send_media_group", source="preuploaded"):
+                    messages = await bot.send_media_group(
+                        chat_id=chat_id, media=[InputMediaPhoto(m.photo[-1].file_id) for m in preuploaded]
+                    )
+                observe("album_first_photo_delivered", time.perf_counter() - started, source="preuploaded")
+                return [m.photo[-1].file_id for m in messages if m.photo]
+        finally:
+            await delete_messages(bot, cache_chat, preuploaded)
+        logger.warning(f"Pre-uploading {len(failures)} page(s) to the cache chat failed ({failures[0]}), uploading the album directly.")
+
+    with span("send_media_group", source="upload"):
+        file_ids = await upload_album(bot, ordered, chat_id)
+    # The photos reach the user together, so the first one lands when the group send returns
+    observe("album_first_photo_delivered", time.perf_counter() - started, source="upload")
+    return file_ids
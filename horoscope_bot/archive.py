@@ -0,0 +1,275 @@
+import os
+import gzip
+import json
+import logging
+import argparse
+from datetime import datetime
+from storage import LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered per Parquet row group / documents per bulk write
+PARQUET_BATCH_ROWS = 5000
+IMPORT_BATCH_SIZE = int(os.getenv("ARCHIVE_IMPORT_BATCH_SIZE", "200"))
+# Website offsets scraped per concurrent batch during a backfill
+BACKFILL_CHUNK = int(os.getenv("ARCHIVE_BACKFILL_CHUNK", "7"))
+
+# One archive row per sign reading; `archive_date` is the stored date key
+READING_FIELDS = ("sign", "text", "date", "count")
+
+
+def _reading_rows(target_date, language, readings):
+    for idx, reading in enumerate(readings):
+        row = {"archive_date": target_date, "language": language, "index": idx}
+        row.update({field: reading.get(field) for field in READING_FIELDS})
+        yield row
+
+
+def _is_parquet(path, fmt):
+    return (fmt or "").lower() == "parquet" or path.endswith(".parquet")
+
+
+class _JSONLWriter:
+    """Line-per-row JSON, gzip-compressed when the path ends in .gz."""
+
+    def __init__(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        self._file = opener(path, "wt", encoding="utf-8")
+
+    def write(self, row):
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Columnar export through pyarrow (optional dependency: `pip install pyarrow`)."""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._schema = pa.schema([
+            ("archive_date", pa.string()),
+            ("language", pa.string()),
+            ("index", pa.int32()),
+            ("sign", pa.string()),
+            ("text", pa.string()),
+            ("date", pa.string()),
+            ("count", pa.int64()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path, fmt=None):
+    return _ParquetWriter(path) if _is_parquet(path, fmt) else _JSONLWriter(path)
+
+
+def iter_rows(path, fmt=None):
+    """Streams archive rows back from a .jsonl(.gz) or .parquet file."""
+    if _is_parquet(path, fmt):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH_ROWS):
+            yield from batch.to_pylist()
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def export_archive(path, languages=LANGUAGES, start: datetime = None, end: datetime = None, fmt=None) -> int:
+    """
+    Streams every stored date (optionally within [start, end]) into one archive file
+    without holding the collection in memory. Returns the number of rows written.
+    """
+    import db
+
+    writer = open_writer(path, fmt)
+    rows = dates = 0
+    try:
+        for language in languages:
+            for target_date, readings in db.iter_horoscopes(language, start, end):
+                for row in _reading_rows(target_date, language, readings):
+                    writer.write(row)
+                    rows += 1
+                dates += 1
+    finally:
+        writer.close()
+    logger.info(f"Exported {dates} date(s), {rows} reading(s) to {path}.")
+    return rows
+
+
+def import_archive(path, fmt=None, batch_size: int = IMPORT_BATCH_SIZE) -> int:
+    """
+    Loads an archive back into storage, `batch_size` dates per bulk write.
+    Rows of one (date, language) must be contiguous, as export_archive writes them.
+    Returns the number of dates written.
+    """
+    import db
+
+    pending = {language: [] for language in LANGUAGES}
+    written = 0
+
+    def flush(language):
+        nonlocal written
+        if pending[language]:
+            written += db.bulk_save_horoscopes(pending[language], language=language)
+            pending[language] = []
+
+    def finish(key, readings):
+        target_date, language = key
+        readings.sort(key=lambda r: r.pop("index"))
+        pending.setdefault(language, []).append((target_date, readings))
+        if len(pending[language]) >= batch_size:
+            flush(language)
+
+    current_key, readings = None, []
+    for row in iter_rows(path, fmt):
+        key = (row["archive_date"], row["language"])
+        if key != current_key:
+            if current_key is not None:
+                finish(current_key, readings)
+            current_key, readings = key, []
+        reading = {field: row.get(field) for field in READING_FIELDS}
+        reading["index"] = row.get("index", len(readings))
+        readings.append(reading)
+    if current_key is not None:
+        finish(current_key, readings)
+    for language in list(pending):
+        flush(language)
+
+    logger.info(f"Imported {written} date(s) from {path}.")
+    return written
+
+
+def backfill(offsets, languages=LANGUAGES, out=None, fmt=None, force: bool = False, chunk: int = BACKFILL_CHUNK) -> int:
+    """
+    Scrapes many website day offsets (`chunk` at a time, every sign concurrently),
+    translates the missing Telugu dates in one batch per chunk and bulk-writes the
+    result. Dates already stored are skipped unless `force`. With `out`, the new
+    readings are also streamed to an archive file. Returns the number of dates written.
+    """
+    import db
+    from scraper import scrape_offsets_async, run_sync
+    from translator import translate_batch
+
+    retention = db.retention_days()
+    if retention is not None:
+        logger.warning(
+            f"RETENTION_DAYS={retention}: backfilled dates older than that are removed on the next cleanup. "
+            f"Set RETENTION_DAYS=forever to keep history."
+        )
+
+    existing = {language: set(db.get_available_dates(language)) for language in languages}
+    writer = open_writer(out, fmt) if out else None
+    written = 0
+    offsets = list(offsets)
+    try:
+        for i in range(0, len(offsets), chunk):
+            batch = offsets[i:i + chunk]
+            scraped = run_sync(scrape_offsets_async(tuple(batch)))
+
+            english = []
+            for offset in batch:
+                results = scraped.get(offset) or []
+                if len(results) != 12 or not all(res.get("count") for res in results):
+                    logger.warning(f"Backfill: incomplete scrape for offset {offset}, skipping.")
+                    continue
+                target_date = results[0].get("date")
+                if not target_date:
+                    # Stored dates must be real dates (retention and /start parse them)
+                    logger.warning(f"Backfill: no date heading for offset {offset}, skipping.")
+                    continue
+                english.append((target_date, results))
+
+            by_language = {}
+            if "english" in languages:
+                by_language["english"] = [(d, r) for d, r in english if force or d not in existing["english"]]
+            if "telugu" in languages:
+                todo = [(d, r) for d, r in english if force or d not in existing["telugu"]]
+                translations = iter(translate_batch([res["text"] for _, results in todo for res in results], source="en", target="te"))
+                by_language["telugu"] = [
+                    (d, [dict(res, text=next(translations)) for res in results]) for d, results in todo
+                ]
+
+            for language, items in by_language.items():
+                written += db.bulk_save_horoscopes(items, language=language)
+                if writer is not None:
+                    for target_date, readings in items:
+                        for row in _reading_rows(target_date, language, readings):
+                            writer.write(row)
+            logger.info(f"Backfill: offsets {batch[0]}..{batch[-1]} done ({written} date(s) written so far).")
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def _parse_day(value):
+    """CLI dates: ISO (2026-01-14) or the website format (14 January 2026)."""
+    for fmt in ("%Y-%m-%d", "%d %B %Y"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"Unrecognised date '{value}'")
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "conf.env"))
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Horoscope archive: backfill, export and import.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="stream stored horoscopes to .jsonl.gz / .parquet")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--language", nargs="+", choices=LANGUAGES, default=list(LANGUAGES))
+    export_cmd.add_argument("--start", type=_parse_day)
+    export_cmd.add_argument("--end", type=_parse_day)
+    export_cmd.add_argument("--format", choices=("jsonl", "parquet"))
+
+    import_cmd = sub.add_parser("import", help="bulk-load an archive into storage")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_cmd.add_argument("--format", choices=("jsonl", "parquet"))
+
+    backfill_cmd = sub.add_parser("backfill", help="scrape a range of website day offsets into storage")
+    backfill_cmd.add_argument("--from", dest="first", type=int, required=True, help="first day offset, e.g. -30")
+    backfill_cmd.add_argument("--to", dest="last", type=int, required=True, help="last day offset, e.g. 1")
+    backfill_cmd.add_argument("--language", nargs="+", choices=LANGUAGES, default=list(LANGUAGES))
+    backfill_cmd.add_argument("--out", help="also write the scraped readings to this archive file")
+    backfill_cmd.add_argument("--format", choices=("jsonl", "parquet"))
+    backfill_cmd.add_argument("--force", action="store_true", help="re-scrape dates that are already stored")
+    backfill_cmd.add_argument("--chunk", type=int, default=BACKFILL_CHUNK)
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_archive(args.path, args.language, args.start, args.end, args.format)
+    elif args.command == "import":
+        import_archive(args.path, args.format, args.batch_size)
+    else:
+        backfill(range(args.first, args.last + 1), args.language, args.out, args.format, args.force, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
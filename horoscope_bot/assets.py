@@ -0,0 +1,162 @@
+import os
+import base64
+import logging
+import mimetypes
+import threading
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+DEFAULT_ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+ASSETS_DIR = os.getenv("ASSETS_DIR", DEFAULT_ASSETS_DIR)
+
+HTML_TEMPLATE_PATH = os.path.join(BASE_DIR, "templates", "horoscope.html")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+FONT_EXTENSIONS = (".ttf", ".otf")
+
+FONT_MIME_TYPES = {
+    ".otf": "font/opentype",
+    ".ttf": "font/truetype",
+}
+
+
+class _Asset:
+    def __init__(self, path, mtime, data):
+        self.path = path
+        self.mtime = mtime
+        self.data = data
+        # Derived forms are built on first use and dropped along with the asset on reload
+        self.data_uri = None
+        self.images = {}
+
+
+class AssetStore:
+    """
+    Memoized registry of template backgrounds, fonts and the HTML template.
+
+    Files are read once and handed out as raw bytes, base64 data URIs or decoded
+    PIL images. Every lookup compares the file's mtime, so edited assets are
+    picked up without restarting the bot.
+    """
+
+    def __init__(self, assets_dir: str = ASSETS_DIR):
+        self.assets_dir = assets_dir
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.reloads = 0
+
+    def _get(self, path) -> _Asset:
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset is not None and asset.mtime == mtime:
+                return asset
+
+        with open(path, "rb") as f:
+            data = f.read()
+        fresh = _Asset(path, mtime, data)
+        with self._lock:
+            if asset is not None:
+                self.reloads += 1
+                logger.info(f"Asset changed on disk, reloaded: {path}")
+            else:
+                self.loads += 1
+            self._assets[path] = fresh
+        return fresh
+
+    def read_bytes(self, path) -> bytes:
+        return self._get(path).data
+
+    def read_text(self, path, encoding="utf-8") -> str:
+        return self._get(path).data.decode(encoding)
+
+    def data_uri(self, path, mime_type=None) -> str:
+        """Base64 data URI for the file, for inlining into the Playwright HTML."""
+        asset = self._get(path)
+        if asset.data_uri is None:
+            ext = os.path.splitext(path)[1].lower()
+            mime_type = mime_type or FONT_MIME_TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+            b64 = base64.b64encode(asset.data).decode("utf-8")
+            asset.data_uri = f"data:{mime_type};base64,{b64}"
+        return asset.data_uri
+
+    def image(self, path, size=None):
+        """
+        Decoded RGB PIL image, LANCZOS-scaled to `size` when given. Each size is decoded once
+        and shared, callers must .copy() before drawing.
+        """
+        asset = self._get(path)
+        key = tuple(size) if size else None
+        image = asset.images.get(key)
+        if image is None:
+            import io
+            from PIL import Image
+            with Image.open(io.BytesIO(asset.data)) as img:
+                image = img.convert("RGB")
+            if key is not None and image.size != key:
+                image = image.resize(key, Image.LANCZOS)
+            asset.images[key] = image
+        return image
+
+    def html_template(self) -> str:
+        return self.read_text(HTML_TEMPLATE_PATH)
+
+    def font_path(self, filename) -> str:
+        return os.path.join(self.assets_dir, "fonts", filename)
+
+    def template_path(self, dir_name, filename) -> str:
+        return os.path.join(self.assets_dir, "templates", dir_name, filename)
+
+    def preload(self):
+        """
+        Reads and pre-encodes every template page and font under the assets directory.
+        """
+        count = 0
+        templates_root = os.path.join(self.assets_dir, "templates")
+        for root, _, files in os.walk(templates_root):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    self.data_uri(os.path.join(root, name))
+                    count += 1
+
+        fonts_root = os.path.join(self.assets_dir, "fonts")
+        if os.path.isdir(fonts_root):
+            for name in os.listdir(fonts_root):
+                if name.lower().endswith(FONT_EXTENSIONS):
+                    self.data_uri(os.path.join(fonts_root, name))
+                    count += 1
+
+        self.html_template()
+        logger.info(f"Asset store: preloaded {count} template/font file(s) from {self.assets_dir}.")
+        return count
+
+    def missing(self, paths) -> list:
+        """Returns the subset of `paths` that do not exist on disk."""
+        return [p for p in paths if not os.path.isfile(p)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "bytes": sum(len(a.data) for a in self._assets.values()),
+                "loads": self.loads,
+                "reloads": self.reloads,
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_asset_store(assets_dir: str = ASSETS_DIR) -> AssetStore:
+    """Returns the shared store for `assets_dir` (one per directory)."""
+    with _stores_lock:
+        store = _stores.get(assets_dir)
+        if store is None:
+            store = AssetStore(assets_dir)
+            _stores[assets_dir] = store
+        return store
@@ -0,0 +1,113 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+import pytz
+from lxml import etree
+import scraper
+from metrics import span, count_cache
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Yesterday, today and tomorrow as the website numbers them
+DATE_OFFSETS = (-1, 0, 1)
+
+# Cached mappings are re-checked in the background after this many seconds,
+# and dropped outright at the IST day rollover.
+DATE_REFRESH_SECONDS = int(os.getenv("DATE_REFRESH_SECONDS", "1800"))
+
+STREAM_CHUNK_SIZE = 8192
+
+# offsets tuple -> {"dates": {date_str: offset}, "fetched_at": ts, "expires_at": ts}
+_memo = {}
+_refresh_tasks = {}
+
+
+def _next_ist_midnight() -> float:
+    """Epoch timestamp of the next 00:00 in Asia/Kolkata."""
+    tomorrow = (datetime.now(IST) + timedelta(days=1)).date()
+    return IST.localize(datetime(tomorrow.year, tomorrow.month, tomorrow.day)).timestamp()
+
+
+async def fetch_date(offset: int, sign: str = "aries"):
+    """
+    Streams one horoscope page and returns the text of its `h3.center` date heading,
+    closing the connection as soon as the heading has been parsed.
+    """
+    client = scraper.get_async_client()
+    url = scraper.horoscope_url(sign, offset)
+    parser = etree.HTMLPullParser(events=("end",), tag="h3")
+
+    try:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+                for _, elem in parser.read_events():
+                    if "center" in (elem.get("class") or "").split():
+                        date_str = " ".join("".join(elem.itertext()).split())
+                        if date_str:
+                            return date_str
+    except Exception as e:
+        logger.error(f"Error resolving date for offset {offset}: {e}")
+    return None
+
+
+async def _resolve(offsets):
+    dates = await asyncio.gather(*(fetch_date(offset) for offset in offsets))
+    return {date_str: offset for offset, date_str in zip(offsets, dates) if date_str}
+
+
+def _store(offsets, mapping):
+    now = time.time()
+    _memo[offsets] = {"dates": mapping, "fetched_at": now, "expires_at": _next_ist_midnight()}
+
+
+async def _refresh(offsets):
+    try:
+        mapping = await _resolve(offsets)
+        if mapping:
+            _store(offsets, mapping)
+    finally:
+        _refresh_tasks.pop(offsets, None)
+
+
+async def resolve_dates(offsets=DATE_OFFSETS, force: bool = False, background_refresh: bool = True) -> dict:
+    """
+    Returns {website date string: offset} for the given day offsets.
+
+    Served from memory until the IST day rolls over; once an entry is older than
+    DATE_REFRESH_SECONDS it is still returned immediately while a background task
+    re-checks the website. An empty dict means the website could not be reached.
+    """
+    offsets = tuple(offsets)
+    now = time.time()
+    entry = _memo.get(offsets)
+
+    if entry and not force and now < entry["expires_at"]:
+        count_cache("dates", True)
+        stale = now - entry["fetched_at"] > DATE_REFRESH_SECONDS
+        if stale and background_refresh and offsets not in _refresh_tasks:
+            _refresh_tasks[offsets] = asyncio.create_task(_refresh(offsets))
+        return dict(entry["dates"])
+
+    count_cache("dates", False)
+    started = time.perf_counter()
+    with span("date_discovery"):
+        mapping = await _resolve(offsets)
+    if mapping:
+        _store(offsets, mapping)
+        logger.info(f"Resolved website dates {mapping} in {(time.perf_counter() - started) * 1000:.0f}ms.")
+    return mapping
+
+
+def resolve_dates_sync(offsets=DATE_OFFSETS, force: bool = False) -> dict:
+    """Blocking variant for the scheduler thread."""
+    return scraper.run_sync(resolve_dates(offsets, force=force, background_refresh=False))
+
+
+def invalidate():
+    _memo.clear()
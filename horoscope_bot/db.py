@@ -1,155 +1,369 @@
 import os
+import time
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
-
-# Load environment variables
-env_path = os.path.join(os.path.dirname(__file__), "conf.env")
-load_dotenv(env_path)
+from storage import MongoBackend, SQLiteBackend
 
 logger = logging.getLogger(__name__)
 
-# Initialize MongoDB client
-MONGO_URI = os.getenv("MONGO_URI")
+MONGO_URI = None
+
+# "mongo" or "sqlite". Defaults to mongo whenever MONGO_URI is set.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "horoscopes.db"))
 
-logger.info(f"Loaded MONGO_URI from env: {'YES' if MONGO_URI else 'NO'}")
+backend = None
+_initialized = False
+_init_lock = threading.Lock()
 
-client = None
-db = None
-collection = None
+# A failed connection (Atlas/DNS hiccup) is retried on the next use after this many seconds
+DB_RETRY_SECONDS = float(os.getenv("DB_RETRY_SECONDS", "30"))
+_connect_error = None
+_retry_at = 0.0
 
 def init_db():
-    global client, db, collection, MONGO_URI
+    """
+    Connects the storage backend on first use (or from the startup warm-up thread).
+    Importing this module no longer touches the network. A failed connection is retried
+    on a later call once DB_RETRY_SECONDS have passed; until then storage is skipped.
+    """
+    global backend, MONGO_URI, STORAGE_BACKEND, SQLITE_PATH, _initialized, _connect_error, _retry_at
     
-    if not MONGO_URI:
-        # Try loading again just in case
+    with _init_lock:
+        if _initialized:
+            return backend
+        now = time.monotonic()
+        if _connect_error is not None and now < _retry_at:
+            logger.warning(f"Storage unavailable ({_connect_error}), skipping it; reconnecting in {_retry_at - now:.0f}s.")
+            return None
+        
+        # Load environment variables
         env_path = os.path.join(os.path.dirname(__file__), "conf.env")
         load_dotenv(env_path)
         MONGO_URI = os.getenv("MONGO_URI")
-        
-    if MONGO_URI and collection is None:
+        STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", STORAGE_BACKEND).lower()
+        SQLITE_PATH = os.getenv("SQLITE_PATH", SQLITE_PATH)
+        logger.info(f"Loaded MONGO_URI from env: {'YES' if MONGO_URI else 'NO'}")
+
+        kind = STORAGE_BACKEND or ("mongo" if MONGO_URI else "")
         try:
-            client = MongoClient(MONGO_URI, server_api=ServerApi('1'))
-            db = client['horoscope_db']
-            collection = db['horoscopes']
-            # Send a ping to confirm a successful connection
-            client.admin.command('ping')
-            logger.info("Pinged your deployment. You successfully connected to MongoDB!")
+            if kind == "sqlite":
+                backend = SQLiteBackend(SQLITE_PATH)
+            elif kind == "mongo" and MONGO_URI:
+                backend = MongoBackend(MONGO_URI)
+            elif kind == "mongo":
+                logger.warning("MONGO_URI not found in conf.env. Caching will be disabled.")
+            elif kind:
+                logger.error(f"Unknown STORAGE_BACKEND '{kind}'. Caching will be disabled.")
+            else:
+                logger.warning("MONGO_URI not found in conf.env. Caching will be disabled.")
         except Exception as e:
-            logger.error(f"MongoDB Connection Error: {e}")
-            collection = None
-    elif not MONGO_URI:
-        logger.warning("MONGO_URI not found in conf.env. Caching will be disabled.")
+            logger.error(f"Storage Connection Error ({kind}): {e}. Retrying in {DB_RETRY_SECONDS:.0f}s.")
+            backend = None
+            _connect_error = e
+            _retry_at = now + DB_RETRY_SECONDS
+            return None
         
-# init immediately
-init_db()
+        # Connected, or storage is deliberately off: either way this is final
+        _connect_error = None
+        _initialized = True
+        return backend
 
 
-def _get_collection(language="english"):
-    """Helper to get the right collection dynamically based on language."""
-    if db is None:
-        return None
-    
-    # english -> horoscopes_en, telugu -> horoscopes_te
-    suffix = 'en' if language.lower() == 'english' else 'te'
-    return db[f'horoscopes_{suffix}']
+# In-process read-through cache in front of the storage backend
+DB_CACHE_TTL = int(os.getenv("DB_CACHE_TTL", "3600"))
+DB_CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "64"))
+
+
+class _TTLCache:
+    """Small thread-safe LRU with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+_cache = _TTLCache(DB_CACHE_TTL, DB_CACHE_MAX_ENTRIES)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the in-process horoscope cache."""
+    return _cache.stats()
+
+
+def _copy_readings(readings):
+    # Callers mutate reading dicts (e.g. when translating), keep the cached copy pristine
+    return [dict(r) for r in readings]
+
 
 def get_horoscopes(target_date: str, language: str = "english"):
     """
     Retrieve cached horoscopes for a specific date string, filtered by language.
     """
-    coll = _get_collection(language)
-    if coll is None:
+    cached = _cache.get((target_date, language))
+    if cached is not None:
+        logger.info(f"Memory cache HIT for {target_date} ({language})")
+        return _copy_readings(cached)
+        
+    init_db()
+    if backend is None:
         return None
         
     try:
-        data = coll.find_one({"date": target_date})
-        if data and "readings" in data:
+        readings = backend.get_horoscopes(target_date, language)
+        if readings:
             logger.info(f"Cache HIT for {target_date} ({language})")
-            return data["readings"]
+            _cache.set((target_date, language), _copy_readings(readings))
+            return readings
         
         logger.info(f"Cache MISS for {target_date} ({language})")
         return None
     except Exception as e:
-        logger.error(f"Error reading from MongoDB: {e}")
+        logger.error(f"Error reading from {backend.name}: {e}")
         return None
 
 def get_available_dates(language: str = "english"):
     """
-    Returns a sorted list of unique date strings currently cached in MongoDB.
+    Returns the unique date strings currently cached, in chronological order.
     """
-    coll = _get_collection(language)
-    if coll is None:
+    cached = _cache.get(("__dates__", language))
+    if cached is not None:
+        return list(cached)
+        
+    init_db()
+    if backend is None:
         return []
     try:
-        dates = coll.distinct("date")
-        # Sort them roughly by parsing if possible, or leave as strings
-        return sorted(dates)
+        dates = backend.get_available_dates(language)
+        _cache.set(("__dates__", language), dates)
+        return list(dates)
     except Exception as e:
-        logger.error(f"Error fetching distinct dates from MongoDB: {e}")
+        logger.error(f"Error fetching available dates from {backend.name}: {e}")
         return []
 
 def save_horoscopes(target_date: str, readings: list, language: str = "english"):
     """
-    Save horoscopes to MongoDB under the correct language collection.
+    Save horoscopes to storage under the correct language.
     """
-    coll = _get_collection(language)
     logger.info(f"Attempting to save {language} horoscopes for date: {target_date}, count: {len(readings)}")
-    if coll is None:
+    init_db()
+    if backend is None:
         logger.error(f"Cannot save horoscopes. DB is None.")
         return
         
     try:
-        document = {
-            "date": target_date,
-            "readings": readings,
-            "language": language,
-            "created_at": datetime.utcnow()
-        }
+        backend.save_horoscopes(target_date, readings, language)
+        logger.info(f"Saved {language} horoscopes for {target_date} to {backend.name}.")
+        
+        # Write-through so the next read is served from memory
+        _cache.set((target_date, language), _copy_readings(readings))
+        _cache.invalidate(("__dates__", language))
         
-        coll.update_one(
-            {"date": target_date},
-            {"$set": document},
-            upsert=True
-        )
-        logger.info(f"Saved {language} horoscopes for {target_date} to MongoDB.")
+        # Readings changed, so any album uploaded for this date/language is stale
+        backend.delete_albums([target_date], language)
     except Exception as e:
-        logger.error(f"Error saving to MongoDB: {e}")
+        logger.error(f"Error saving to {backend.name}: {e}")
+
+def retention_days():
+    """
+    RETENTION_DAYS: days of history kept before Indian today (default 1, i.e. Indian
+    Yesterday onwards). "forever" / "none" / "off" disables cleanup to keep an archive.
+    """
+    value = os.getenv("RETENTION_DAYS", "1").strip().lower()
+    if value in ("forever", "none", "off", ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        # A typo such as "7d" must not break every scrape that cleans up after itself
+        logger.error(f"Invalid RETENTION_DAYS {value!r}, keeping the default of 1 day.")
+        return 1
 
-def cleanup_old_horoscopes(days_to_keep: int = 1, language: str = "english"):
+def cleanup_old_horoscopes(days_to_keep: int = None, language: str = "english"):
     """
-    Deletes cached horoscopes strictly older than Indian Yesterday.
+    Deletes cached horoscopes strictly older than `days_to_keep` days before Indian today
+    (defaults to RETENTION_DAYS) with a single indexed range delete.
     """
-    coll = _get_collection(language)
-    if coll is None:
+    init_db()
+    if backend is None:
         return
         
+    if days_to_keep is None:
+        days_to_keep = retention_days()
+        if days_to_keep is None:
+            return
+        
     import pytz
-    from datetime import datetime, timedelta
     
     ist = pytz.timezone('Asia/Kolkata')
     today_ist = datetime.now(ist).date()
-    yesterday_ist = today_ist - timedelta(days=1)
+    cutoff_ist = today_ist - timedelta(days=days_to_keep)
+    cutoff = datetime(cutoff_ist.year, cutoff_ist.month, cutoff_ist.day)
+        
+    try:
+        stale_dates = backend.delete_older_than(cutoff, language)
+        if not stale_dates:
+            return
+        backend.delete_albums(stale_dates, language)
+        for date_str in stale_dates:
+            _cache.invalidate((date_str, language))
+        _cache.invalidate(("__dates__", language))
+        logger.info(f"Cleaned up {len(stale_dates)} old {language} horoscope records (older than IST {cutoff_ist}).")
+    except Exception as e:
+        logger.error(f"Error cleaning up {backend.name}: {e}")
+
+def iter_horoscopes(language: str = "english", start: datetime = None, end: datetime = None):
+    """
+    Streams (date string, readings) in chronological order, bypassing the memory cache.
+    Used by archive.py for exports.
+    """
+    init_db()
+    if backend is None:
+        return
+    try:
+        yield from backend.iter_horoscopes(language, start, end)
+    except Exception as e:
+        logger.error(f"Error streaming horoscopes from {backend.name}: {e}")
+
+def bulk_save_horoscopes(items: list, language: str = "english") -> int:
+    """
+    Upserts many (date string, readings) pairs in one batched write. Returns how many were written.
+    """
+    init_db()
+    if backend is None:
+        logger.error(f"Cannot save horoscopes. DB is None.")
+        return 0
+    if not items:
+        return 0
         
     try:
-        # We need to process each document to parse the string date
-        docs = coll.find({})
-        deleted = 0
-        for doc in docs:
-            date_str = doc.get("date")
-            if not date_str: continue
-            try:
-                # Website formats date as "24 February 2026"
-                doc_date = datetime.strptime(date_str, "%d %B %Y").date()
-                if doc_date < yesterday_ist:
-                    coll.delete_one({"_id": doc["_id"]})
-                    deleted += 1
-            except Exception as e:
-                pass
-                
-        if deleted > 0:
-            logger.info(f"Cleaned up {deleted} old {language} horoscope records (older than IST yesterday: {yesterday_ist}).")
+        backend.bulk_save_horoscopes(items, language)
+        dates = [target_date for target_date, _ in items]
+        for target_date in dates:
+            _cache.invalidate((target_date, language))
+        _cache.invalidate(("__dates__", language))
+        backend.delete_albums(dates, language)
+        logger.info(f"Bulk saved {len(items)} {language} date(s) to {backend.name}.")
+        return len(items)
+    except Exception as e:
+        logger.error(f"Error bulk saving to {backend.name}: {e}")
+        return 0
+
+def get_album_file_ids(target_date: str, template_id: str, language: str = "english"):
+    """
+    Returns the Telegram file_ids recorded for a previously sent album, or None.
+    """
+    init_db()
+    if backend is None:
+        return None
+    try:
+        file_ids = backend.get_album_file_ids(target_date, template_id, language)
+        if file_ids:
+            logger.info(f"Album file_id HIT for {target_date} (template {template_id}, {language})")
+            return file_ids
+        return None
+    except Exception as e:
+        logger.error(f"Error reading album file_ids from {backend.name}: {e}")
+        return None
+
+def save_album_file_ids(target_date: str, template_id: str, language: str, file_ids: list):
+    """
+    Records the Telegram file_ids of an uploaded album so it can be resent without re-uploading.
+    """
+    init_db()
+    if backend is None:
+        return
+    try:
+        backend.save_album_file_ids(target_date, template_id, language, file_ids)
+        logger.info(f"Saved album file_ids for {target_date} (template {template_id}, {language}).")
+    except Exception as e:
+        logger.error(f"Error saving album file_ids to {backend.name}: {e}")
+
+def get_translations(keys: list):
+    """
+    Returns {content hash: translation} for the keys present in the translation memory.
+    """
+    init_db()
+    if backend is None or not keys:
+        return {}
+    try:
+        return backend.get_translations(keys)
+    except Exception as e:
+        logger.error(f"Error reading translations from {backend.name}: {e}")
+        return {}
+
+def save_translations(mapping: dict):
+    """
+    Upserts {content hash: translation} entries into the translation memory.
+    """
+    init_db()
+    if backend is None or not mapping:
+        return
+    try:
+        backend.save_translations(mapping)
+    except Exception as e:
+        logger.error(f"Error saving translations to {backend.name}: {e}")
+
+def get_render_blob(key: str):
+    """
+    Returns rendered JPEG bytes stored under `key` (GridFS / SQLite blob), or None.
+    """
+    init_db()
+    if backend is None:
+        return None
+    try:
+        return backend.get_render_blob(key)
+    except Exception as e:
+        logger.error(f"Error reading render cache from {backend.name}: {e}")
+        return None
+
+def save_render_blob(key: str, data: bytes):
+    """
+    Stores rendered JPEG bytes under `key` (content-addressed, so written once).
+    """
+    init_db()
+    if backend is None:
+        return
+    try:
+        backend.save_render_blob(key, data)
     except Exception as e:
-        logger.error(f"Error cleaning up MongoDB: {e}")
+        logger.error(f"Error saving render cache to {backend.name}: {e}")
@@ -0,0 +1,107 @@
+import os
+import logging
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# "lxml" (default): precompiled XPath over a bare lxml tree.
+# "bs4": the original BeautifulSoup path, kept as a reference and fallback.
+SCRAPE_PARSER = os.getenv("SCRAPE_PARSER", "lxml").lower()
+
+# Same elements the CSS selectors h3.center, div.daily-horoscope-text and div#day_<sign> p pick
+_has_class = 'contains(concat(" ", normalize-space(@class), " "), " {} ")'
+DATE_XPATH = etree.XPath(f'(//h3[{_has_class.format("center")}])[1]')
+TEXT_XPATH = etree.XPath(f'(//div[{_has_class.format("daily-horoscope-text")}])[1]')
+SIDEBAR_XPATH = etree.XPath('(//div[@id = $div_id]//p)[1]')
+# Text nodes as BeautifulSoup's get_text() sees them: no comments, scripts or styles
+STRINGS_XPATH = etree.XPath('descendant::text()[not(ancestor::script) and not(ancestor::style)]')
+
+_utf8_parser = etree.HTMLParser(encoding="utf-8")
+_sniffing_parser = etree.HTMLParser()
+
+
+def _strings(element):
+    return [s.strip() for s in STRINGS_XPATH(element) if s.strip()]
+
+
+def _parse_tree(content: bytes):
+    # Pages are UTF-8; let libxml2 sniff the <meta> charset only when they are not
+    try:
+        content.decode("utf-8")
+        parser = _utf8_parser
+    except UnicodeDecodeError:
+        parser = _sniffing_parser
+    return etree.fromstring(content, parser)
+
+
+def extract_lxml(content: bytes, sign: str):
+    """
+    Returns (date, text) exactly as the BeautifulSoup path would, or ("", "") when the
+    page has neither the full text nor the sidebar summary.
+    """
+    root = _parse_tree(content)
+    if root is None:
+        return "", ""
+
+    date = ""
+    text = ""
+
+    date_elems = DATE_XPATH(root)
+    if date_elems:
+        date = "".join(_strings(date_elems[0]))
+
+    text_elems = TEXT_XPATH(root)
+    if text_elems:
+        text = " ".join(" ".join(_strings(text_elems[0])).split())
+    else:
+        sidebar_elems = SIDEBAR_XPATH(root, div_id=f"day_{sign}")
+        if sidebar_elems:
+            text = "\n".join(_strings(sidebar_elems[0]))
+
+    return date, text
+
+
+def extract_bs4(content: bytes, sign: str):
+    """The original BeautifulSoup extraction, returning (date, text)."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'lxml')
+
+    text = ""
+    date = ""
+
+    # Extract Date
+    # Based on analysis, date is in <h3 class="center" style="text-align: center;">14 January 2026</h3>
+    date_elem = soup.select_one('h3.center')
+    if date_elem:
+        date = date_elem.get_text(strip=True)
+
+    # Strategy 1: Primary Target (Full Text)
+    full_text_div = soup.select_one('div.daily-horoscope-text')
+    if full_text_div:
+        text = full_text_div.get_text(separator=' ', strip=True)
+        # Extra cleanup
+        text = " ".join(text.split())
+    else:
+        # Strategy 2: Fallback Target (Sidebar Summary)
+        sidebar_div = soup.select_one(f'div#day_{sign} p')
+        if sidebar_div:
+            text = sidebar_div.get_text(separator="\n", strip=True)
+            # If we are falling back, it might not be specific to "tomorrow" if the sidebar doesn't update dynamically via JS query param,
+            # but this is the best effort given the structure.
+
+    return date, text
+
+
+EXTRACTORS = {
+    "lxml": extract_lxml,
+    "bs4": extract_bs4,
+}
+
+
+def extract(content: bytes, sign: str, parser: str = None):
+    """(date, text) for one horoscope page using SCRAPE_PARSER (or `parser`)."""
+    extractor = EXTRACTORS.get(parser or SCRAPE_PARSER)
+    if extractor is None:
+        logger.error(f"Unknown SCRAPE_PARSER '{parser or SCRAPE_PARSER}', using lxml.")
+        extractor = extract_lxml
+    return extractor(content, sign)
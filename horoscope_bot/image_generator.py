@@ -1,9 +1,20 @@
-import base64
+import io
 import os
+import logging
+import threading
 import textwrap
 from PIL import Image, ImageDraw, ImageFont
-from playwright.sync_api import sync_playwright
 import tempfile
+from contextlib import contextmanager
+from render_pool import get_render_pool, RENDER_POOL_SIZE
+from render_cache import get_render_cache, page_key
+import pillow_renderer
+from assets import get_asset_store
+from singleflight import SingleFlight
+from admission import get_gate
+from metrics import span, count_cache
+
+logger = logging.getLogger(__name__)
 
 # Constants from User Request (Map Coords)
 # Date: 863,122,221,48 -> Rect(221, 48, 863, 122)
@@ -47,6 +58,7 @@ TEMPLATE_CONFIGS = {
         "text_color": (230, 221, 212), 
         "date_color": (28, 56, 33),   
         "date_format": "full",        
+        "engine": "playwright",
     },
     "2": {
         "dir_name": "Template-2",
@@ -57,22 +69,158 @@ TEMPLATE_CONFIGS = {
         "text_color": (0, 0, 0),      
         "date_color": (255, 255, 255),
         "date_format": "no_year",     
+        "engine": "playwright",
     }
 }
 
+# Rendering backend: "playwright" (headless Chromium) or "pillow" (native, no browser).
+# When set, overrides the per-template "engine" in TEMPLATE_CONFIGS.
+RENDER_ENGINE = os.getenv("RENDER_ENGINE")
+
+# Max pages of a single album rendered at once (defaults to one per warm pool page)
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", str(RENDER_POOL_SIZE)))
+# Seconds to wait for any single pool page before failing the album (and freeing its gate slot)
+RENDER_PAGE_TIMEOUT = float(os.getenv("RENDER_PAGE_TIMEOUT", "90"))
+
 HTML_TEMPLATE_PATH = os.path.join(BASE_DIR, "templates", "horoscope.html")
 
-def generate_horoscope_images(horoscopes, date_label, template_id="1", language="english", assets_dir=ASSETS_DIR):
-    image_paths = []
+_render_flight = SingleFlight("album-render")
+_raqm_fallback_logged = False
+
+TELUGU_FONT_FILE = "Potti Sreeramulu Regular.otf"
+
+# Template 1 has dedicated Telugu backgrounds
+LANGUAGE_TEMPLATE_OVERRIDES = {
+    ("1", "telugu"): ("template1_telugu", "{}.png"),
+}
+
+def _template_location(config, template_id, language):
+    """Returns (dir_name, file_pattern) of the background pages for this template/language."""
+    return LANGUAGE_TEMPLATE_OVERRIDES.get(
+        (template_id, language), (config["dir_name"], config["file_pattern"])
+    )
+
+def validate_assets(assets_dir=ASSETS_DIR):
+    """
+    Checks that every background page and font referenced by TEMPLATE_CONFIGS exists.
+    Returns the list of missing paths (empty when everything is in place).
+    """
+    store = get_asset_store(assets_dir)
+    expected = [store.font_path(TELUGU_FONT_FILE)]
+    for template_id, config in TEMPLATE_CONFIGS.items():
+        for language in ("english", "telugu"):
+            dir_name, file_pattern = _template_location(config, template_id, language)
+            expected.extend(
+                store.template_path(dir_name, file_pattern.format(idx)) for idx in range(1, 7)
+            )
+    missing = store.missing(sorted(set(expected)))
+    for path in missing:
+        logger.error(f"Missing template asset: {path}")
+    return missing
+
+def resolve_engine(template_id, language, engine=None):
+    """
+    Render backend for an album: `engine`, else RENDER_ENGINE, else the template's own.
+    Pillow draws Telugu unshaped without libraqm, so those albums go to Playwright instead.
+    """
+    global _raqm_fallback_logged
     config = TEMPLATE_CONFIGS.get(template_id, TEMPLATE_CONFIGS["1"])
+    engine = engine or RENDER_ENGINE or config.get("engine", "playwright")
+    if engine == "pillow" and language == "telugu" and not pillow_renderer.HAS_RAQM:
+        if not _raqm_fallback_logged:
+            logger.warning("Pillow was built without libraqm; rendering Telugu albums with Playwright instead.")
+            _raqm_fallback_logged = True
+        return "playwright"
+    return engine
+
+def uses_playwright():
+    """True when any template/language album would render through the Chromium pool."""
+    return any(
+        resolve_engine(template_id, language) == "playwright"
+        for template_id in TEMPLATE_CONFIGS
+        for language in ("english", "telugu")
+    )
+
+def generate_horoscope_images(horoscopes, date_label, template_id="1", language="english", assets_dir=ASSETS_DIR, concurrency=None, engine=None, output="files", output_dir=None, on_page=None):
+    """
+    Renders the six two-sign pages of an album.
     
-    # Language-based Template Directory Routing
-    current_dir_name = config["dir_name"]
-    current_file_pattern = config["file_pattern"]
-    if template_id == "1" and language == "telugu":
-        current_dir_name = "template1_telugu"
-        current_file_pattern = "{}.png"
+    output="bytes": returns in-memory io.BytesIO buffers (nothing touches the disk).
+    output="files": writes horoscope_N.jpg into `output_dir` and returns the paths. Without an
+    output_dir a fresh temp directory is created per call; the caller owns it (see album_files()).
+    
+    on_page(index, jpeg_bytes), when given, is called from a worker thread as soon as each page
+    is ready (in completion order) so callers can start uploading before the album is done.
+    """
+    config = TEMPLATE_CONFIGS.get(template_id, TEMPLATE_CONFIGS["1"])
+    engine = resolve_engine(template_id, language, engine)
+    
+    # Pages can complete on several render workers at once; report each exactly once
+    delivered = set()
+    delivered_lock = threading.Lock()
+    def deliver(idx, jpeg_bytes):
+        if on_page is None:
+            return
+        with delivered_lock:
+            if idx in delivered:
+                return
+            delivered.add(idx)
+        on_page(idx, jpeg_bytes)
+    
+    # Users asking for the same album at the same time share one render
+    with span("render_album", engine=engine):
+        pages = _render_flight.do(
+            (date_label, template_id, language, engine, assets_dir),
+            _render_album_pages,
+            horoscopes, date_label, template_id, language, assets_dir, concurrency, engine, config, deliver
+        )
+    
+    # Callers that joined someone else's render only see the pages once it completes
+    for idx, jpeg_bytes in enumerate(pages):
+        deliver(idx, jpeg_bytes)
+    
+    if output == "bytes":
+        buffers = []
+        for idx, jpeg_bytes in enumerate(pages, start=1):
+            buffer = io.BytesIO(jpeg_bytes)
+            buffer.name = f"horoscope_{idx}.jpg"
+            buffers.append(buffer)
+        return buffers
         
+    if output_dir is None:
+        output_dir = tempfile.mkdtemp(prefix="horoscope_")
+    image_paths = []
+    for idx, jpeg_bytes in enumerate(pages, start=1):
+        out_path = os.path.join(output_dir, f"horoscope_{idx}.jpg")
+        with open(out_path, "wb") as f:
+            f.write(jpeg_bytes)
+        image_paths.append(out_path)
+    return image_paths
+
+@contextmanager
+def album_files(*args, **kwargs):
+    """
+    Renders an album into a private temp directory and removes it on exit:
+    
+        with album_files(horoscopes, "14 January 2026") as paths: ...
+    """
+    with tempfile.TemporaryDirectory(prefix="horoscope_") as output_dir:
+        yield generate_horoscope_images(*args, output="files", output_dir=output_dir, **kwargs)
+
+def _notify_when_done(future, page_idx, on_page):
+    """Hands a pool page to on_page from the render worker the moment it succeeds."""
+    def callback(f):
+        if f.exception() is None:
+            on_page(page_idx, f.result())
+    future.add_done_callback(callback)
+
+def _render_album_pages(horoscopes, date_label, template_id, language, assets_dir, concurrency, engine, config, on_page=None):
+    """Returns the JPEG bytes of every page, in sign order. Reports each page to on_page as it lands."""
+    
+    store = get_asset_store(assets_dir)
+    
+    # Language-based Template Directory Routing
+    current_dir_name, current_file_pattern = _template_location(config, template_id, language)
     template_dir = os.path.join(assets_dir, "templates", current_dir_name)
     
     # Pre-calculate dimensions from coords
@@ -97,99 +245,143 @@ def generate_horoscope_images(horoscopes, date_label, template_id="1", language=
         if len(parts) >= 2:
             display_date = f"{parts[0]} {parts[1]}"
             
-    # Read HTML Template
-    with open(HTML_TEMPLATE_PATH, "r", encoding="utf-8") as f:
-        html_template = f.read()
+    # HTML template, backgrounds and fonts come pre-encoded from the asset store
+    html_template = store.html_template()
         
     dr, dg, db = config["date_color"]
     tr, tg, tb = config["text_color"]
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        # Set viewport explicitly to 1080x1080 to match our template bounds
-        page = browser.new_page(viewport={"width": 1080, "height": 1080})
+    if language == "telugu":
+        font_uri = store.data_uri(store.font_path(TELUGU_FONT_FILE))
+            
+        font_face_css = f'''
+            @font-face {{
+                font-family: 'Potti Sreeramulu';
+                src: url('{font_uri}') format('opentype');
+            }}
+        '''
+        font_family = "'Potti Sreeramulu', 'Nirmala UI', sans-serif"
+    else:
+        font_face_css = ""
+        font_family = "'Nirmala UI', 'Gautami', 'Noto Sans Telugu', sans-serif"
         
-        if language == "telugu":
-            custom_font_path = os.path.join(assets_dir, "fonts", "Potti Sreeramulu Regular.otf")
-            with open(custom_font_path, "rb") as font_file:
-                b64_font = base64.b64encode(font_file.read()).decode('utf-8')
+    # Warm browser pages are shared with the scheduler, see render_pool.py
+    pool = get_render_pool()
+    cache = get_render_cache()
+    concurrency = max(1, concurrency or RENDER_CONCURRENCY)
+    pages = []
+    page_jobs = []
+    
+    for i in range(0, 12, 2):
+        if i >= len(horoscopes): break
+        
+        template_idx = (i // 2) + 1
+        template_filename = current_file_pattern.format(template_idx)
+        template_path = os.path.join(template_dir, template_filename).replace("\\", "/") # Playwright needs forward slashes
+        
+        text1 = horoscopes[i]['text']
+        text2 = ""
+        if i+1 < len(horoscopes):
+            text2 = horoscopes[i+1]['text']
                 
-            font_face_css = f'''
-                @font-face {{
-                    font-family: 'Potti Sreeramulu';
-                    src: url('data:font/opentype;charset=utf-8;base64,{b64_font}') format('opentype');
-                }}
-            '''
-            font_family = "'Potti Sreeramulu', 'Nirmala UI', sans-serif"
-        else:
-            font_face_css = ""
-            font_family = "'Nirmala UI', 'Gautami', 'Noto Sans Telugu', sans-serif"
-            
-        for i in range(0, 12, 2):
-            if i >= len(horoscopes): break
-            
-            template_idx = (i // 2) + 1
-            template_filename = current_file_pattern.format(template_idx)
-            template_path = os.path.join(template_dir, template_filename).replace("\\", "/") # Playwright needs forward slashes
+        page_idx = len(pages)
+        pages.append(None)
+        
+        # Identical readings + design + date + font always produce the same pixels
+        cache_key = page_key(
+            text1=text1,
+            text2=text2,
+            template_path=os.path.relpath(template_path, assets_dir),
+            config=config,
+            display_date=display_date,
+            font_family=font_family,
+            language=language,
+            engine=engine,
+            html_template=html_template if engine == "playwright" else None,
+            pillow_layout=pillow_renderer.LAYOUT_VERSION if engine == "pillow" else None,
+        )
+        cached = cache.get(cache_key)
+        count_cache("render", cached is not None)
+        if cached is not None:
+            pages[page_idx] = cached
+            if on_page is not None:
+                on_page(page_idx, cached)
+            continue
             
-            text1 = horoscopes[i]['text']
-            # Text formatting
-            if language == "telugu":
-                text1 = text1.replace("\n", "<br/>")
+        if engine == "pillow":
+            # Native layout, no browser round trip
+            with span("render_page", engine="pillow"):
+                jpeg_bytes = pillow_renderer.render_page(
+                    template_path, display_date, text1, text2, config, language=language, assets_dir=assets_dir
+                )
+            pages[page_idx] = jpeg_bytes
+            cache.put(cache_key, jpeg_bytes)
+            if on_page is not None:
+                on_page(page_idx, jpeg_bytes)
+            continue
             
-            text2 = ""
-            if i+1 < len(horoscopes):
-                text2 = horoscopes[i+1]['text']
-                if language == "telugu":
-                    text2 = text2.replace("\n", "<br/>")
-                
-            # Inject Background Template correctly with base64 to bypass 'about:blank' local rendering policies
-            with open(template_path, "rb") as bf:
-                b64_img = base64.b64encode(bf.read()).decode('utf-8')
-            b64_uri = f"data:image/jpeg;base64,{b64_img}"
+        # Text formatting
+        if language == "telugu":
+            text1 = text1.replace("\n", "<br/>")
+            text2 = text2.replace("\n", "<br/>")
             
-            # Render HTML
-            rendered_html = html_template \
-                .replace("file:///__TEMPLATE_PATH__", b64_uri) \
-                .replace("__DISPLAY_DATE__", display_date) \
-                .replace("__TEXT1__", text1) \
-                .replace("__TEXT2__", text2) \
-                .replace("__DATE_RX__", str(d_rx)) \
-                .replace("__DATE_RY__", str(d_ry)) \
-                .replace("__DATE_RW__", str(d_rw)) \
-                .replace("__DATE_RH__", str(d_rh)) \
-                .replace("__P1_RX__", str(p1x1)) \
-                .replace("__P1_RY__", str(p1y1)) \
-                .replace("__P1_RW__", str(p1_w)) \
-                .replace("__P1_RH__", str(p1_h)) \
-                .replace("__P2_RX__", str(p2x1)) \
-                .replace("__P2_RY__", str(p2y1)) \
-                .replace("__P2_RW__", str(p2_w)) \
-                .replace("__P2_RH__", str(p2_h)) \
-                .replace("__DATE_R__", str(dr)) \
-                .replace("__DATE_G__", str(dg)) \
-                .replace("__DATE_B__", str(db)) \
-                .replace("__TEXT_R__", str(tr)) \
-                .replace("__TEXT_G__", str(tg)) \
-                .replace("__TEXT_B__", str(tb)) \
-                .replace("__FONT_FACE_CSS__", font_face_css) \
-                .replace("__FONT_FAMILY__", font_family)
+        # Inject Background Template correctly with base64 to bypass 'about:blank' local rendering policies
+        b64_uri = store.data_uri(template_path)
+        
+        # Render HTML
+        rendered_html = html_template \
+            .replace("file:///__TEMPLATE_PATH__", b64_uri) \
+            .replace("__DISPLAY_DATE__", display_date) \
+            .replace("__TEXT1__", text1) \
+            .replace("__TEXT2__", text2) \
+            .replace("__DATE_RX__", str(d_rx)) \
+            .replace("__DATE_RY__", str(d_ry)) \
+            .replace("__DATE_RW__", str(d_rw)) \
+            .replace("__DATE_RH__", str(d_rh)) \
+            .replace("__P1_RX__", str(p1x1)) \
+            .replace("__P1_RY__", str(p1y1)) \
+            .replace("__P1_RW__", str(p1_w)) \
+            .replace("__P1_RH__", str(p1_h)) \
+            .replace("__P2_RX__", str(p2x1)) \
+            .replace("__P2_RY__", str(p2y1)) \
+            .replace("__P2_RW__", str(p2_w)) \
+            .replace("__P2_RH__", str(p2_h)) \
+            .replace("__DATE_R__", str(dr)) \
+            .replace("__DATE_G__", str(dg)) \
+            .replace("__DATE_B__", str(db)) \
+            .replace("__TEXT_R__", str(tr)) \
+            .replace("__TEXT_G__", str(tg)) \
+            .replace("__TEXT_B__", str(tb)) \
+            .replace("__FONT_FACE_CSS__", font_face_css) \
+            .replace("__FONT_FAMILY__", font_family)
             
-            page.set_content(rendered_html)
+        page_jobs.append((page_idx, cache_key, rendered_html))
+        
+    # Spread the pages over the pool, keeping at most `concurrency` of this album in flight.
+    # The "render" gate caps how many albums share the pool at once (see admission.py).
+    if page_jobs:
+        with get_gate("render").slot():
+            futures = []
+            for idx, (_, _, rendered_html) in enumerate(page_jobs):
+                if idx >= concurrency:
+                    futures[idx - concurrency].result(timeout=RENDER_PAGE_TIMEOUT)
+                future = pool.submit(rendered_html)
+                if on_page is not None:
+                    _notify_when_done(future, page_jobs[idx][0], on_page)
+                futures.append(future)
             
-            # Explicitly force a tiny delay so the custom TTF/OTF font file parses from disk
-            page.wait_for_timeout(250)
-                
-            out_filename = f"horoscope_{template_idx}.jpg"
-            page.screenshot(path=out_filename, type="jpeg", quality=95, full_page=True)
-            image_paths.append(out_filename)
+            for (page_idx, cache_key, _), future in zip(page_jobs, futures):
+                pages[page_idx] = future.result(timeout=RENDER_PAGE_TIMEOUT)
+                cache.put(cache_key, pages[page_idx])
             
-        browser.close()
+    if page_jobs:
+        logger.info(f"Render pool stats: {pool.stats()}")
+    logger.info(f"Render cache: {len(pages) - len(page_jobs)}/{len(pages)} page(s) served from cache. Stats: {cache.stats()}")
         
-    return image_paths
+    return pages
 
 if __name__ == "__main__":
     # Test
     sample_data = [{"sign": str(i), "text": "Sample horoscope text " * 10} for i in range(12)]
-    generate_horoscope_images(sample_data, "14 January 2026")
+    print(generate_horoscope_images(sample_data, "14 January 2026", output_dir="."))
     print("Templates generated.")
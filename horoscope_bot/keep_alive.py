@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
 import os
 
@@ -8,6 +8,12 @@ app = Flask('')
 def home():
     return "I'm alive"
 
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format: stage latency histograms, cache hit/miss counters, queue gauges
+    from metrics import render_latest
+    return Response(render_latest(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
 def run():
     # Render sets PORT env var. Default to 8080 if not set.
     port = int(os.environ.get("PORT", 8080))
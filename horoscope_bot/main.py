@@ -1,21 +1,13 @@
 
 import os
+import asyncio
 import logging
-import datetime
+import functools
+import startup
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-from scraper import fetch_horoscope, get_horoscopes_by_date
 
-# Load environment variables
-env_path = os.path.join(os.path.dirname(__file__), "conf.env")
-load_dotenv(env_path)
-
-
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 
@@ -24,21 +16,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Fetches dates from website and shows dates, falling back to MongoDB if down."""
     await update.message.reply_text("Welcome to the Horoscope Bot! 🌟\nFetching available dates...")
     
-    date_offsets = {}
-    website_up = False
-    
-    offsets = [-1, 0, 1]
-    
-    # 1. Check if website is up and get dates
-    for offset in offsets:
-         try:
-             data = fetch_horoscope("aries", offset)
-             date_str = data.get('date')
-             if date_str and date_str != "Unknown":
-                 date_offsets[date_str] = offset
-                 website_up = True
-         except:
-             pass
+    # 1. Check if website is up and get dates (memoized until the IST day rolls over)
+    from dates import resolve_dates
+    date_offsets = await resolve_dates()
+    website_up = bool(date_offsets)
 
     context.user_data['date_offsets'] = date_offsets
     keyboard = []
@@ -112,48 +93,85 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         fallback_offset = context.user_data.get('date_offsets', {}).get(target_date)
         
+        from scraper import get_horoscopes_by_date_async
         from image_generator import generate_horoscope_images
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        default_assets_dir = os.path.join(os.path.dirname(base_dir), "assets")
-        assets_dir = os.getenv("ASSETS_DIR", default_assets_dir)
+        from admission import get_gate, Overloaded
+        from metrics import span, count_cache
         
         await query.edit_message_text(text=f"Generating **{target_date}** horoscopes in **{language.title()}**... Please wait 📸", parse_mode='Markdown')
         
         try:
-            # Check DB or Fetch website via target_date
-            # Offload synchronous Playwright hooks AND blocking translates
-            import asyncio
-            horoscopes = await asyncio.to_thread(
-                get_horoscopes_by_date, target_date, language, fallback_offset
-            )
+            # Albums already sent once are resent by Telegram file_id, no re-upload
+            from db import get_album_file_ids, save_album_file_ids
+            cached_file_ids = await asyncio.to_thread(get_album_file_ids, target_date, template_id, language)
+            count_cache("album_file_ids", bool(cached_file_ids), language=language)
+            if cached_file_ids:
+                try:
+                    media_group = [InputMediaPhoto(file_id) for file_id in cached_file_ids]
+                    with span("send_media_group", source="file_id"):
+                        await context.bot.send_media_group(chat_id=query.message.chat_id, media=media_group)
+                    await context.bot.send_message(
+                        chat_id=query.message.chat_id, 
+                        text="Here are your daily readings! ✨"
+                    )
+                    return
+                except Exception as e:
+                    logger.warning(f"Resending cached album failed, regenerating: {e}")
             
-            if not horoscopes:
-                await query.message.reply_text("Sorry, failed to fetch horoscopes for that date.")
-                return
-            
-            context.user_data['date_label'] = target_date
-
-            # Generate Images 
-            image_paths = await asyncio.to_thread(
-                generate_horoscope_images,
-                horoscopes, 
-                target_date, 
-                template_id=template_id, 
-                language=language, 
-                assets_dir=assets_dir
-            )
-            
-            context.user_data['generated_images'] = image_paths
-            
-            # Send Album
-            media_group = [InputMediaPhoto(open(path, 'rb')) for path in image_paths]
-            await context.bot.send_media_group(chat_id=query.message.chat_id, media=media_group)
+            # Admission control: a bounded number of albums are built at once, the rest
+            # wait in line (and are told their position) or are turned away when the line is full
+            async def notify_queued(position):
+                await query.edit_message_text(
+                    text=f"Lots of requests right now ⏳ You're **#{position}** in the queue for **{target_date}**...",
+                    parse_mode='Markdown'
+                )
+                
+            async with get_gate("album").slot_async(on_queued=notify_queued):
+                # Check DB or Fetch website via target_date
+                horoscopes = await get_horoscopes_by_date_async(target_date, language, fallback_offset)
+                
+                if not horoscopes:
+                    await query.message.reply_text("Sorry, failed to fetch horoscopes for that date.")
+                    return
+                
+                context.user_data['date_label'] = target_date
+
+                # Render in a worker thread and report each page as it lands. Upload only
+                # overlaps rendering (page k uploads while k+1 renders) with CACHE_CHAT_ID set
+                from album_cache import ProgressReporter, deliver_album
+                progress = ProgressReporter(lambda text: query.edit_message_text(text=text, parse_mode='Markdown'))
+                page_count = (len(horoscopes) + 1) // 2
+                file_ids = await deliver_album(
+                    context.bot,
+                    query.message.chat_id,
+                    functools.partial(
+                        generate_horoscope_images,
+                        horoscopes,
+                        target_date,
+                        template_id=template_id,
+                        language=language,
+                        output="bytes"
+                    ),
+                    page_count,
+                    progress=progress,
+                    progress_text=lambda done, total: f"Generating **{target_date}** in **{language.title()}**... page {done}/{total} ready 📸"
+                )
+
+            if len(file_ids) == page_count:
+                await asyncio.to_thread(save_album_file_ids, target_date, template_id, language, file_ids)
             
             await context.bot.send_message(
                 chat_id=query.message.chat_id, 
                 text="Here are your daily readings! ✨"
             )
 
+        except Overloaded as e:
+            logger.warning(f"Shedding album request for {target_date} ({language}): {e}")
+            await context.bot.send_message(
+                chat_id=query.message.chat_id,
+                text="The bot is very busy right now 🙏 Please try again in a minute."
+            )
+
         except Exception as e:
             import traceback
             err_msg = traceback.format_exc()
@@ -162,27 +180,102 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 f.write(err_msg)
             await context.bot.send_message(chat_id=query.message.chat_id, text="An error occurred while generating horoscopes.")
 
+def _warm_up_steps():
+    """Heavy subsystems, in the order the warm-up thread initializes them."""
+    def render_pool():
+        # Chromium launches on the pool's own render thread; this only kicks it off.
+        # With every template on the Pillow engine no browser is started at all.
+        from image_generator import uses_playwright
+        if not uses_playwright():
+            logger.info("No template renders with Playwright; not starting the browser pool.")
+            return
+        from render_pool import start_render_pool
+        start_render_pool()
+
+    def storage():
+        import db
+        db.init_db()
+
+    def assets():
+        # Read and pre-encode every template/font once, and flag missing pages early
+        from assets import get_asset_store
+        from image_generator import validate_assets
+        get_asset_store().preload()
+        validate_assets()
+
+    def translator():
+        from translator import get_backend, get_translation_memory
+        get_translation_memory()
+        get_backend()
+
+    def browser():
+        from image_generator import uses_playwright
+        if not uses_playwright():
+            return
+        from render_pool import get_render_pool
+        return get_render_pool().wait_until_ready(startup.browser_ready_timeout())
+
+    return [
+        ("render_pool", render_pool),
+        ("storage", storage),
+        ("assets", assets),
+        ("translator", translator),
+        ("browser", browser),
+    ]
+
+
+async def _on_polling_start(application: Application) -> None:
+    startup.mark("polling")
+    logger.info(f"Bot is polling {startup.elapsed_ms():.0f}ms after launch (startup mode: {startup.startup_mode()}).")
+    if startup.startup_mode() == "lazy":
+        startup.log_report()
+
+    # Start the daily prefetch scheduler on the bot's own event loop
+    try:
+        from scheduler import start_scheduler
+        start_scheduler()
+    except Exception as e:
+        logger.error(f"Failed to start scheduler: {e}")
+
+
+async def _on_shutdown(application: Application) -> None:
+    from scheduler import stop_scheduler
+    await stop_scheduler()
+
+
 def main() -> None:
     """Run the bot."""
+    # Load environment variables
+    env_path = os.path.join(os.path.dirname(__file__), "conf.env")
+    load_dotenv(env_path)
+
+    # Enable logging
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+    )
+
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
         logger.error("No TELEGRAM_BOT_TOKEN found in .env file.")
         return
 
-    import pytz
-    
-    # Disable PTB's job queue fully to stop the conflict with Python 3.13 zoneinfo defaults
-    application = Application.builder().token(token).job_queue(None).build()
+    # Disable PTB's job queue fully to stop the conflict with Python 3.13 zoneinfo defaults;
+    # scheduler.AsyncScheduler runs the daily prefetch on this application's loop instead
+    application = (
+        Application.builder()
+        .token(token)
+        .job_queue(None)
+        .post_init(_on_polling_start)
+        .post_shutdown(_on_shutdown)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CallbackQueryHandler(button_handler)) # General buttons
 
-    # Start the daily prefetch scheduler
-    try:
-        from scheduler import start_scheduler
-        start_scheduler()
-    except Exception as e:
-        logger.error(f"Failed to start scheduler: {e}")
+    # Mongo, Chromium and the translator come up behind the poller (or on first use in lazy mode)
+    if startup.startup_mode() != "lazy":
+        startup.warm_up_in_background(_warm_up_steps())
 
     # Start the keep-alive server
     try:
@@ -194,5 +287,8 @@ def main() -> None:
     # Run the bot
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
+    from render_pool import shutdown_render_pool
+    shutdown_render_pool()
+
 if __name__ == "__main__":
     main()
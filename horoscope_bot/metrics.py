@@ -0,0 +1,201 @@
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans range from sub-millisecond cache hits to minute-long cold albums
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout (_bucket, _sum, _count)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][idx] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    out.append((f"{self.name}_bucket", key, (("le", _format_value(bound)),), cumulative))
+                out.append((f"{self.name}_sum", key, (), series["sum"]))
+                out.append((f"{self.name}_count", key, (), series["count"]))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def gauge(self, name, documentation, collect):
+        """`collect()` returns [(labels dict, value)] and is called at scrape time."""
+        with self._lock:
+            self._gauges[name] = (documentation, collect)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauges = list(self._gauges.items())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_label_text(key, extra)} {_format_value(value)}")
+        for name, (documentation, collect) in gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.error(f"Collecting gauge {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                lines.append(f"{name}{_label_text(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "horoscope_stage_duration_seconds", "Duration of each pipeline stage (date discovery, scrape, translate, render, upload)."
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "horoscope_stage_errors_total", "Pipeline stages that raised."
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "horoscope_cache_requests_total", "Cache lookups by layer and result (hit/miss)."
+)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """
+    Times a block into horoscope_stage_duration_seconds{stage=...}. Works inside
+    coroutines too, since it only reads the clock on entry and exit.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage, **labels)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, **labels)
+
+
+def observe(stage: str, seconds: float, **labels):
+    """Records a duration measured elsewhere (e.g. inside a render worker)."""
+    STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+
+
+def count_cache(layer: str, hit: bool, **labels):
+    CACHE_REQUESTS.inc(layer=layer, result="hit" if hit else "miss", **labels)
+
+
+def _runtime_gauges():
+    """Live state of subsystems that are already running; never imports (or starts) anything."""
+    values = []
+    render_pool = sys.modules.get("render_pool")
+    pool = getattr(render_pool, "_pool", None) if render_pool else None
+    if pool is not None:
+        stats = pool.stats()
+        for key in ("alive_workers", "queued"):
+            values.append(({"subsystem": "render_pool", "field": key}, stats[key]))
+    admission = sys.modules.get("admission")
+    if admission is not None:
+        for gate, stats in admission.admission_stats().items():
+            for key in ("active", "waiting"):
+                values.append(({"subsystem": f"gate_{gate}", "field": key}, stats[key]))
+    return values
+
+
+REGISTRY.gauge("horoscope_runtime", "Current queue depths and workers of running subsystems.", _runtime_gauges)
+
+
+def render_latest() -> str:
+    """Prometheus text exposition of everything recorded so far."""
+    return REGISTRY.render()
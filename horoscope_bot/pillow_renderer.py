@@ -0,0 +1,177 @@
+import io
+import os
+import math
+import logging
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont, features
+from assets import get_asset_store
+
+logger = logging.getLogger(__name__)
+
+CANVAS_SIZE = (1080, 1080)
+
+# Part of the render cache key; bump whenever the drawn pixels change
+LAYOUT_VERSION = 2
+
+# Same sizing rules as templates/horoscope.html: 24px stylesheet size, autoFit() shrinking
+# to 14px, line-height 1.6 and a 47px date
+PARA_MAX_FONT_SIZE = 24
+PARA_MIN_FONT_SIZE = 14
+PARA_LINE_HEIGHT = 1.6
+DATE_FONT_SIZE = 47
+
+# Not the same faces as the HTML: its stack ('Nirmala UI', 'Gautami', ...) names system
+# fonts that are not shipped, so Chromium picks whatever the host has. Pillow needs font
+# files and uses the bundled ones below, so the two engines wrap close to, but not exactly,
+# the same lines. Telugu uses Potti Sreeramulu in both.
+FONT_FILES = {
+    "date": "ArchivoBlack-Regular.ttf",
+    "english": "GlacialIndifference-Bold.otf",
+    "telugu": "Potti Sreeramulu Regular.otf",
+}
+
+# Telugu conjuncts need complex shaping, which Pillow only does through libraqm
+HAS_RAQM = features.check("raqm")
+_raqm_warning_logged = False
+
+
+@lru_cache(maxsize=128)
+def _load_font(path, size, use_raqm):
+    layout = ImageFont.Layout.RAQM if use_raqm else ImageFont.Layout.BASIC
+    return ImageFont.truetype(path, size, layout_engine=layout)
+
+
+def _font(assets_dir, role, size, language="english"):
+    global _raqm_warning_logged
+    path = os.path.join(assets_dir, "fonts", FONT_FILES[role])
+    use_raqm = HAS_RAQM and language == "telugu"
+    if language == "telugu" and not HAS_RAQM and not _raqm_warning_logged:
+        logger.warning("Pillow was built without libraqm; Telugu text will not be shaped correctly.")
+        _raqm_warning_logged = True
+    return _load_font(path, size, use_raqm)
+
+
+def _wrap(draw, text, font, max_width):
+    """
+    Greedy word wrap. Returns a list of (words, word_widths, is_paragraph_end) tuples.
+    Each distinct word is measured once; a line is as wide as its words plus the spaces.
+    """
+    space_width = draw.textlength(" ", font=font)
+    word_widths = {}
+    lines = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split()
+        if not words:
+            continue
+        for word in words:
+            if word not in word_widths:
+                word_widths[word] = draw.textlength(word, font=font)
+        current = [words[0]]
+        current_width = word_widths[words[0]]
+        for word in words[1:]:
+            candidate_width = current_width + space_width + word_widths[word]
+            if candidate_width <= max_width:
+                current.append(word)
+                current_width = candidate_width
+            else:
+                lines.append((current, [word_widths[w] for w in current], False))
+                current = [word]
+                current_width = word_widths[word]
+        lines.append((current, [word_widths[w] for w in current], True))
+    return lines
+
+
+def _fit_paragraph(draw, text, box, assets_dir, language):
+    """
+    Picks the largest font size (24px down to 14px) whose wrapped text fits the box height,
+    binary-searching the sizes instead of wrapping at every one. Falls back to 14px.
+    """
+    x1, y1, x2, y2 = box
+    width, height = x2 - x1, y2 - y1
+    role = "telugu" if language == "telugu" else "english"
+
+    def layout(size):
+        font = _font(assets_dir, role, size, language)
+        return font, size, _wrap(draw, text, font, width)
+
+    def fits(result):
+        _, size, lines = result
+        return len(lines) * size * PARA_LINE_HEIGHT <= height
+
+    low, high = PARA_MIN_FONT_SIZE, PARA_MAX_FONT_SIZE
+    best = layout(low)
+    if not fits(best):
+        return best
+    # Invariant: `low` fits
+    while low < high:
+        mid = (low + high + 1) // 2
+        result = layout(mid)
+        if fits(result):
+            low, best = mid, result
+        else:
+            high = mid - 1
+    return best
+
+
+def _draw_justified(draw, x, y, words, word_widths, space_width, width, font, color):
+    """
+    text-align: justify with a single text rasterization: the line is drawn once with
+    normal spaces into a mask, which is cut in the middle of each space and blitted with
+    the slack spread evenly over the gaps.
+    """
+    line = " ".join(words)
+    _, _, right, bottom = font.getbbox(line)
+    pad = 2
+    mask = Image.new("L", (math.ceil(right) + 2 * pad, math.ceil(bottom) + pad), 0)
+    ImageDraw.Draw(mask).text((pad, 0), line, font=font, fill=255)
+
+    gap = (width - sum(word_widths) - space_width * (len(words) - 1)) / (len(words) - 1)
+    origin = 0.0
+    last = len(words) - 1
+    for idx, word_width in enumerate(word_widths):
+        left = 0 if idx == 0 else round(pad + origin - space_width / 2)
+        right_edge = mask.width if idx == last else round(pad + origin + word_width + space_width / 2)
+        piece = mask.crop((left, 0, right_edge, mask.height))
+        draw.bitmap((round(x - pad + left + idx * gap), round(y)), piece, fill=color)
+        origin += word_width + space_width
+
+
+def _draw_paragraph(draw, text, box, color, assets_dir, language):
+    x1, y1, x2, _ = box
+    width = x2 - x1
+    font, size, lines = _fit_paragraph(draw, text, box, assets_dir, language)
+    space_width = draw.textlength(" ", font=font)
+    line_height = size * PARA_LINE_HEIGHT
+    # CSS centres the glyphs inside each line box
+    y = y1 + (line_height - size) / 2
+
+    for words, word_widths, is_paragraph_end in lines:
+        if is_paragraph_end or len(words) == 1:
+            draw.text((x1, y), " ".join(words), font=font, fill=color)
+        else:
+            _draw_justified(draw, x1, y, words, word_widths, space_width, width, font, color)
+        y += line_height
+
+
+def _draw_date(draw, display_date, box, color, assets_dir):
+    x1, y1, x2, y2 = box
+    font = _font(assets_dir, "date", DATE_FONT_SIZE)
+    draw.text(((x1 + x2) / 2, (y1 + y2) / 2), display_date, font=font, fill=color, anchor="mm")
+
+
+def render_page(template_path, display_date, text1, text2, config, language="english", assets_dir=None):
+    """
+    Renders one two-sign page natively with Pillow and returns the JPEG bytes.
+    """
+    # Decoded and scaled to the canvas once by the asset store; copy so the shared background stays clean
+    canvas = get_asset_store(assets_dir).image(template_path, size=CANVAS_SIZE).copy()
+
+    draw = ImageDraw.Draw(canvas)
+    _draw_date(draw, display_date, config["date_coords"], config["date_color"], assets_dir)
+    _draw_paragraph(draw, text1, config["para1_coords"], config["text_color"], assets_dir, language)
+    if text2:
+        _draw_paragraph(draw, text2, config["para2_coords"], config["text_color"], assets_dir, language)
+
+    buffer = io.BytesIO()
+    canvas.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
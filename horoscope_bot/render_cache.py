@@ -0,0 +1,146 @@
+import os
+import json
+import logging
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "horoscope_render_cache"))
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "256"))
+# Mirror rendered pages into the storage backend (Mongo GridFS / SQLite) so they survive container restarts
+RENDER_CACHE_GRIDFS = os.getenv("RENDER_CACHE_GRIDFS", "false").lower() in ("1", "true", "yes")
+
+
+def page_key(**parts) -> str:
+    """
+    Content hash for one rendered page. Callers pass everything that changes the pixels
+    (readings text, template config, display date, font, ...).
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Size-bounded LRU store of rendered JPEG bytes on local disk, optionally backed by db storage.
+    """
+
+    def __init__(self, cache_dir: str = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_MB * 1024 * 1024, use_gridfs: bool = RENDER_CACHE_GRIDFS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.use_gridfs = use_gridfs
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".jpg"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        if entries:
+            logger.info(f"Render cache: indexed {len(entries)} page(s), {self._total_bytes // 1024} KB on disk.")
+
+    def get(self, key: str):
+        """Returns the cached JPEG bytes for `key`, or None."""
+        with self._lock:
+            known = key in self._index
+            if known:
+                self._index.move_to_end(key)
+
+        if known:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                # Keep mtime as the recency marker so the LRU order survives restarts
+                os.utime(self._path(key), None)
+                self.hits += 1
+                return data
+            except OSError:
+                with self._lock:
+                    self._total_bytes -= self._index.pop(key, 0)
+
+        if self.use_gridfs:
+            import db
+            data = db.get_render_blob(key)
+            if data:
+                self._store_local(key, data)
+                self.hits += 1
+                return data
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        self._store_local(key, data)
+        if self.use_gridfs:
+            import db
+            db.save_render_blob(key, data)
+
+    def _store_local(self, key, data):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Render cache write failed for {key}: {e}")
+            return
+
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+        if evicted:
+            logger.info(f"Render cache: evicted {len(evicted)} page(s) to stay under {self.max_bytes // (1024 * 1024)} MB.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache()
+        return _cache
@@ -0,0 +1,313 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from metrics import observe, span
+
+logger = logging.getLogger(__name__)
+
+# Warm pages rendering at once inside the single shared browser (overridable from conf.env / container env)
+RENDER_POOL_SIZE = int(os.getenv("RENDER_POOL_SIZE", "3"))
+# Pages are thrown away and re-opened after this many screenshots to keep Chromium memory flat
+RENDER_PAGE_MAX_USES = int(os.getenv("RENDER_PAGE_MAX_USES", "50"))
+
+# Upper bound on waiting for fonts/images before screenshotting anyway
+RENDER_READY_TIMEOUT_MS = int(os.getenv("RENDER_READY_TIMEOUT_MS", "3000"))
+
+VIEWPORT = {"width": 1080, "height": 1080}
+
+# Resolves once every declared font face is loaded and every <img> is decoded,
+# then re-runs the template's autoFit with the final font metrics.
+READY_SCRIPT = """
+async (timeoutMs) => {
+    const ready = (async () => {
+        await Promise.all(Array.from(document.fonts).map(f => f.load().catch(() => null)));
+        await document.fonts.ready;
+        await Promise.all(Array.from(document.images).map(img => img.decode().catch(() => null)));
+        if (typeof fitAll === 'function') fitAll();
+        return true;
+    })();
+    const timeout = new Promise(resolve => setTimeout(() => resolve(false), timeoutMs));
+    return await Promise.race([ready, timeout]);
+}
+"""
+
+
+class _RenderJob:
+    def __init__(self, html, out_path=None):
+        self.html = html
+        self.out_path = out_path
+        self.future = Future()
+        self.retried = False
+        self.ready_ms = None
+
+
+class _BrowserCrashed(Exception):
+    pass
+
+
+class RenderPool:
+    """
+    One long-lived Chromium with a pool of warm pages.
+
+    Playwright objects are bound to the thread that created them, so a single render
+    thread owns the browser and drives it through the async API on its own event loop:
+    `size` page workers (coroutines) pull jobs from a shared queue and render concurrently
+    in the one browser. Pages are recycled after `max_uses` renders; a crashed browser is
+    relaunched and the jobs it was rendering are retried once.
+    """
+
+    def __init__(self, size: int = RENDER_POOL_SIZE, max_uses: int = RENDER_PAGE_MAX_USES):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._thread = None
+        self._loop = None
+        self._queue = None
+        self._loop_ready = threading.Event()
+        self._running = False
+        self._lock = threading.Lock()
+        self._browser_ready = threading.Event()
+        self._live_pages = 0
+        self._stats = {
+            "renders": 0,
+            "failures": 0,
+            "page_recycles": 0,
+            "browser_launches": 0,
+            "browser_restarts": 0,
+            "render_time_total": 0.0,
+            "ready_wait_total": 0.0,
+            "ready_wait_max_ms": 0.0,
+            "ready_timeouts": 0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._loop_ready.clear()
+            self._thread = threading.Thread(target=self._run, name="render-browser", daemon=True)
+            self._thread.start()
+        self._loop_ready.wait()
+        logger.info(f"Render pool started: one browser, {self.size} page(s).")
+
+    def submit(self, html: str, out_path: str = None) -> Future:
+        """
+        Queues one HTML page for screenshotting. The future resolves to the JPEG bytes;
+        they are also written to `out_path` when one is given.
+        """
+        if not self._running:
+            self.start()
+        job = _RenderJob(html, out_path)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job.future
+
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """Blocks until the browser is up. Returns False on timeout."""
+        if not self._running:
+            self.start()
+        return self._browser_ready.wait(timeout)
+
+    def render(self, html: str, out_path: str = None, timeout: float = None) -> bytes:
+        return self.submit(html, out_path).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["alive_workers"] = self._live_pages
+        stats["workers"] = self.size
+        stats["queued"] = self._queue.qsize() if self._queue is not None else 0
+        renders = stats["renders"]
+        stats["avg_render_ms"] = round(stats["render_time_total"] / renders * 1000, 1) if renders else 0.0
+        stats["avg_ready_wait_ms"] = round(stats["ready_wait_total"] / renders, 1) if renders else 0.0
+        stats["ready_wait_max_ms"] = round(stats["ready_wait_max_ms"], 1)
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        for _ in range(self.size):
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        self._thread.join(timeout=10)
+        self._thread = None
+        logger.info(f"Render pool stopped. Final stats: {self.stats()}")
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._loop_ready.set()
+        try:
+            loop.run_until_complete(self._supervise())
+        finally:
+            loop.close()
+
+    async def _supervise(self):
+        try:
+            from playwright.async_api import async_playwright
+        except ImportError as e:
+            logger.error(f"Render pool: Playwright is not installed ({e}).")
+            with self._lock:
+                self._running = False
+            self._fail_queued(e)
+            return
+
+        restart_delay = 1
+        while self._running:
+            try:
+                async with async_playwright() as p:
+                    with span("browser_launch"):
+                        browser = await p.chromium.launch()
+                    self._bump("browser_launches")
+                    self._browser_ready.set()
+                    logger.info(f"Render pool: Chromium launched with {self.size} page worker(s).")
+                    workers = [asyncio.create_task(self._page_worker(browser)) for _ in range(self.size)]
+                    done, running = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+                    for task in running:
+                        task.cancel()
+                    await asyncio.gather(*running, return_exceptions=True)
+                    try:
+                        await browser.close()
+                    except Exception:
+                        pass
+                    for task in done:
+                        if task.exception() is not None:
+                            raise task.exception()
+                restart_delay = 1
+            except Exception as e:
+                if not self._running:
+                    break
+                self._bump("browser_restarts")
+                logger.error(f"Render pool: browser crashed ({e}). Restarting in {restart_delay}s...")
+                await asyncio.sleep(restart_delay)
+                restart_delay = min(restart_delay * 2, 30)
+
+        self._fail_queued(RuntimeError("Render pool shut down."))
+
+    def _fail_queued(self, error):
+        """Whatever is still queued will never be rendered."""
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if job is not None and not job.future.done():
+                job.future.set_exception(error)
+
+    def _retry_or_fail(self, job, error):
+        """A job caught in a browser crash is rendered once more, then failed."""
+        if job.future.done():
+            return
+        if job.retried or not self._running:
+            self._bump("failures")
+            job.future.set_exception(error)
+        else:
+            job.retried = True
+            self._queue.put_nowait(job)
+
+    @staticmethod
+    async def _close_page(page):
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug(f"Closing render page failed: {e}")
+
+    async def _render_job(self, page, job):
+        with span("set_content"):
+            await page.set_content(job.html, wait_until="load")
+        # Wait for the real readiness signals (fonts + decoded background) instead of a fixed sleep
+        started = time.perf_counter()
+        ready = await page.evaluate(READY_SCRIPT, RENDER_READY_TIMEOUT_MS)
+        job.ready_ms = (time.perf_counter() - started) * 1000
+        observe("ready_wait", job.ready_ms / 1000)
+        with self._lock:
+            self._stats["ready_wait_total"] += job.ready_ms
+            self._stats["ready_wait_max_ms"] = max(self._stats["ready_wait_max_ms"], job.ready_ms)
+        if not ready:
+            self._bump("ready_timeouts")
+            logger.warning(f"Render readiness timed out after {job.ready_ms:.0f}ms, capturing anyway.")
+        else:
+            logger.debug(f"Page ready after {job.ready_ms:.1f}ms.")
+        with span("screenshot"):
+            return await page.screenshot(path=job.out_path, type="jpeg", quality=95, full_page=True)
+
+    async def _page_worker(self, browser):
+        page = None
+        uses = 0
+        with self._lock:
+            self._live_pages += 1
+        try:
+            while self._running:
+                job = await self._queue.get()
+                if job is None:
+                    break
+
+                started = time.perf_counter()
+                try:
+                    if page is None or uses >= self.max_uses:
+                        if page is not None:
+                            await self._close_page(page)
+                            page = None
+                            self._bump("page_recycles")
+                        with span("new_page"):
+                            page = await browser.new_page(viewport=VIEWPORT)
+                        uses = 0
+                    jpeg_bytes = await self._render_job(page, job)
+                except asyncio.CancelledError:
+                    # Another page saw the browser die; this job did not fail on its own
+                    if not job.future.done():
+                        self._queue.put_nowait(job)
+                    raise
+                except Exception as e:
+                    if not browser.is_connected():
+                        self._retry_or_fail(job, e)
+                        raise _BrowserCrashed(str(e)) from e
+                    self._bump("failures")
+                    job.future.set_exception(e)
+                    if page is not None:
+                        await self._close_page(page)
+                        page = None
+                    continue
+
+                uses += 1
+                self._bump("renders")
+                self._bump("render_time_total", time.perf_counter() - started)
+                job.future.set_result(jpeg_bytes)
+        finally:
+            with self._lock:
+                self._live_pages -= 1
+            if page is not None and browser.is_connected():
+                await self._close_page(page)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> RenderPool:
+    """Returns the process-wide render pool shared by the Telegram handlers and the scheduler."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
+
+
+def start_render_pool() -> RenderPool:
+    pool = get_render_pool()
+    pool.start()
+    return pool
+
+
+def shutdown_render_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -1,61 +1,438 @@
-import logging
+import os
+import json
 import time
-import threading
-import schedule
+import random
+import asyncio
+import logging
+import concurrent.futures
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytz
+from metrics import observe
 
 logger = logging.getLogger(__name__)
 
-def prefetch_daily_data():
+# Website day offsets the daily job keeps warm: yesterday, today and tomorrow
+PREFETCH_OFFSETS = (-1, 0, 1)
+
+# Pause between album uploads to the cache chat, to stay clear of Telegram's group flood limits
+ALBUM_UPLOAD_INTERVAL = float(os.getenv("ALBUM_UPLOAD_INTERVAL", "3"))
+
+
+@contextmanager
+def _stage(report, name):
+    started = time.perf_counter()
+    logger.info(f"Prefetch stage '{name}' started.")
+    try:
+        yield
+    finally:
+        report[name] = round((time.perf_counter() - started) * 1000, 1)
+        observe("prefetch", report[name] / 1000, step=name)
+        logger.info(f"Prefetch stage '{name}' finished in {report[name]:.0f}ms.")
+
+
+def _scrape_stage(offset_dates):
     """
-    Job that runs daily to pre-fetch tomorrow's and today's horoscopes 
-    in both English and Telugu to populate the MongoDB cache.
+    English readings for every date, scraping only the offsets not already stored.
+    All missing offsets are fetched in one concurrent batch.
     """
-    logger.info("Starting daily scheduled pre-fetch job...")
+    import db
+    from scraper import scrape_offsets_async, run_sync
+    
+    english = {}
+    missing = {}
+    for offset, date_str in offset_dates.items():
+        cached = db.get_horoscopes(date_str, language="english")
+        if cached:
+            english[date_str] = cached
+        else:
+            missing[offset] = date_str
+            
+    if not missing:
+        return english
+        
+    scraped = run_sync(scrape_offsets_async(tuple(missing)))
+    for offset, results in scraped.items():
+        if len(results) == 12 and all(res.get("count") for res in results):
+            fetched_date = results[0].get("date") or missing[offset]
+            db.save_horoscopes(fetched_date, results, language="english")
+            english[fetched_date] = results
+        else:
+            logger.warning(f"⚠️ Scheduled Job: Incomplete scrape for {missing[offset]} (offset {offset})")
+    return english
+
+
+def _translate_stage(english):
+    """Telugu readings for every English date, translating all missing dates in one batch."""
+    import db
+    from translator import translate_batch
     
-    # We fetch for yesterday (-1), today (0) and tomorrow (1).
-    days_to_fetch = [-1, 0, 1]
+    telugu = {}
+    pending = {}
+    for date_str, results in english.items():
+        cached = db.get_horoscopes(date_str, language="telugu")
+        if cached:
+            telugu[date_str] = cached
+        else:
+            pending[date_str] = results
+            
+    if not pending:
+        return telugu
+        
+    texts = [res["text"] for results in pending.values() for res in results]
+    translations = iter(translate_batch(texts, source="en", target="te"))
+    for date_str, results in pending.items():
+        telugu_results = []
+        for res in results:
+            telugu_res = res.copy()
+            telugu_res["text"] = next(translations)
+            telugu_results.append(telugu_res)
+        db.save_horoscopes(date_str, telugu_results, language="telugu")
+        telugu[date_str] = telugu_results
+    return telugu
+
+
+def _render_stage(readings):
+    """
+    Renders every template x language album that has no uploaded file_ids yet.
+    Pages land in the render cache either way, so a later user request never waits on Chromium.
+    """
+    import db
+    from image_generator import generate_horoscope_images, TEMPLATE_CONFIGS
     
-    from scraper import fetch_horoscope, get_horoscopes_by_date
-    for day in days_to_fetch:
-        try:
-            # First map the offset to the actual website date
-            check_data = fetch_horoscope("aries", day)
-            date_str = check_data.get('date')
-            if not date_str or date_str == "Unknown":
-                logger.warning(f"⚠️ Scheduled Job: Could not determine date for offset {day}")
+    albums = {}
+    for (language, date_str), rows in readings.items():
+        for template_id in TEMPLATE_CONFIGS:
+            if db.get_album_file_ids(date_str, template_id, language):
                 continue
-                
+            try:
+                albums[(date_str, template_id, language)] = generate_horoscope_images(
+                    rows, date_str, template_id=template_id, language=language, output="bytes"
+                )
+            except Exception as e:
+                logger.error(f"❌ Scheduled Job: Rendering {date_str} template {template_id} ({language}) failed - {e}")
+    return albums
+
+
+def _upload_stage(albums):
+    """Uploads rendered albums to CACHE_CHAT_ID and stores their file_ids for instant resends."""
+    import db
+    from album_cache import cache_chat_id, upload_album
+    
+    chat_id = cache_chat_id()
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not albums:
+        return 0
+    if not chat_id or not token:
+        logger.info("CACHE_CHAT_ID or TELEGRAM_BOT_TOKEN not set, skipping album pre-upload.")
+        return 0
+        
+    async def upload_all():
+        from telegram import Bot
+        uploaded = 0
+        async with Bot(token) as bot:
+            for idx, ((date_str, template_id, language), images) in enumerate(albums.items()):
+                if idx:
+                    await asyncio.sleep(ALBUM_UPLOAD_INTERVAL)
+                try:
+                    file_ids = await upload_album(bot, images, chat_id, disable_notification=True)
+                    if len(file_ids) == len(images):
+                        db.save_album_file_ids(date_str, template_id, language, file_ids)
+                        uploaded += 1
+                except Exception as e:
+                    logger.error(f"❌ Scheduled Job: Uploading {date_str} template {template_id} ({language}) failed - {e}")
+        return uploaded
+        
+    return asyncio.run(upload_all())
+
+
+def prefetch_daily_data(offsets=PREFETCH_OFFSETS, prerender: bool = True):
+    """
+    Job that runs daily so every user request afterwards is a pure cache hit.
+    
+    Staged pipeline: resolve dates -> scrape all offsets concurrently -> translate ->
+    clean up -> pre-render every template x language album -> upload to the cache chat.
+    Each stage skips work that is already stored, so re-running it is cheap.
+    Returns {stage: duration in ms}.
+    """
+    logger.info("Starting daily scheduled pre-fetch job...")
+    report = {}
+    
+    try:
+        from dates import resolve_dates_sync
+        import db
+        
+        # First map the offsets to the actual website dates (one concurrent round trip)
+        with _stage(report, "dates"):
+            offset_dates = {offset: date_str for date_str, offset in resolve_dates_sync(offsets, force=True).items()}
+        if not offset_dates:
+            logger.warning("⚠️ Scheduled Job: Could not determine any website dates, aborting.")
+            return report
+            
+        with _stage(report, "scrape"):
+            english = _scrape_stage(offset_dates)
+            
+        with _stage(report, "translate"):
+            telugu = _translate_stage(english)
+            
+        with _stage(report, "cleanup"):
             for lang in ['english', 'telugu']:
-                logger.info(f"Scheduled Job: Fetching for {date_str} (offset {day}) in language: {lang}")
-                results = get_horoscopes_by_date(date_str, language=lang, fallback_offset=day)
-                if results and len(results) == 12:
-                    logger.info(f"✅ Scheduled Job: Successfully cached data for {date_str} ({lang})")
-                else:
-                    logger.warning(f"⚠️ Scheduled Job: Failed to cache complete data for {date_str} ({lang})")
+                db.cleanup_old_horoscopes(language=lang)
+                
+        logger.info(f"✅ Scheduled Job: Cached {len(english)} English and {len(telugu)} Telugu date(s).")
+        
+        if prerender:
+            readings = {("english", d): rows for d, rows in english.items()}
+            readings.update({("telugu", d): rows for d, rows in telugu.items()})
+            
+            with _stage(report, "render"):
+                albums = _render_stage(readings)
+                
+            with _stage(report, "upload"):
+                uploaded = _upload_stage(albums)
+            logger.info(f"✅ Scheduled Job: Rendered {len(albums)} album(s), uploaded {uploaded}.")
+    except Exception as e:
+        logger.error(f"❌ Scheduled Job Error: {e}")
+
+    summary = ", ".join(f"{name}={ms:.0f}ms" for name, ms in report.items())
+    logger.info(f"Daily scheduled pre-fetch job completed! Stage timings: {summary}")
+    return report
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Cron expression (minute hour day month weekday) in IST for the daily prefetch
+PREFETCH_CRON = os.getenv("PREFETCH_CRON", "0 8 * * *")
+# Random delay added to every run so restarts of several replicas don't hit the site together
+PREFETCH_JITTER_SECONDS = float(os.getenv("PREFETCH_JITTER_SECONDS", "120"))
+# A run missed while the bot was down is caught up on startup if it was due within this window
+PREFETCH_MISFIRE_GRACE = float(os.getenv("PREFETCH_MISFIRE_GRACE", str(12 * 3600)))
+
+SCHEDULER_STATE_PATH = os.getenv(
+    "SCHEDULER_STATE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scheduler_state.json")
+)
+
+
+class CronTrigger:
+    """
+    Minimal 5-field cron (minute hour day month weekday, weekday 0 = Sunday) evaluated
+    in a fixed timezone. Fields accept *, */n, a-b, a-b/n and comma lists. As in cron,
+    when both day of month and weekday are restricted a day matching either one fires.
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression: str, tz=IST):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        self.expression = expression
+        self.tz = tz
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        # A field starting with "*" (including "*/n") leaves the day unrestricted for the OR rule
+        self._days_restricted = not fields[2].startswith("*")
+        self._weekdays_restricted = not fields[4].startswith("*")
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step = part.split("/", 1)
+                step = int(step)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(v) for v in part.split("-", 1))
+            else:
+                start = end = int(part)
+            if start < low or end > high or step < 1:
+                raise ValueError(f"Cron field '{field}' out of range {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        day_ok = day.day in self.days
+        # Python: Monday = 0; cron: Sunday = 0
+        weekday_ok = (day.weekday() + 1) % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def _fire_time(self, day, hour, minute):
+        return self.tz.localize(datetime(day.year, day.month, day.day, hour, minute))
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First fire time strictly after `moment` (aware datetime)."""
+        local = moment.astimezone(self.tz)
+        for day_offset in range(0, 366 * 4):
+            day = local.date() + timedelta(days=day_offset)
+            if not self._day_matches(day):
+                continue
+            for hour in self.hours:
+                if day_offset == 0 and hour < local.hour:
+                    continue
+                for minute in self.minutes:
+                    candidate = self._fire_time(day, hour, minute)
+                    if candidate > local:
+                        return candidate
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+    def previous_before(self, moment: datetime, horizon: timedelta = timedelta(days=8)):
+        """Latest fire time at or before `moment` within `horizon`, or None."""
+        local = moment.astimezone(self.tz)
+        earliest = local - horizon
+        day = local.date()
+        # One walk backwards: newest matching day first, then its hours and minutes
+        while day >= earliest.date():
+            if self._day_matches(day):
+                for hour in reversed(self.hours):
+                    if day == local.date() and hour > local.hour:
+                        continue
+                    for minute in reversed(self.minutes):
+                        candidate = self._fire_time(day, hour, minute)
+                        if candidate < earliest:
+                            return None
+                        if candidate <= local:
+                            return candidate
+            day -= timedelta(days=1)
+        return None
+
+
+class AsyncScheduler:
+    """
+    Runs blocking jobs on cron triggers from inside the bot's event loop.
+
+    Each job sleeps on the loop until its next fire time (plus jitter) and then runs
+    in a worker thread, so Telegram updates keep flowing. A job never overlaps itself,
+    and a run missed while the process was down is caught up once on start.
+    """
+
+    def __init__(self, state_path: str = SCHEDULER_STATE_PATH, max_workers: int = 1):
+        self.state_path = state_path
+        self._jobs = {}
+        self._tasks = []
+        self._running = set()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self._state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Could not read scheduler state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self):
+        try:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Could not write scheduler state {self.state_path}: {e}")
+
+    def add_job(self, name, fn, trigger: CronTrigger, jitter: float = 0, misfire_grace: float = 0):
+        self._jobs[name] = {"fn": fn, "trigger": trigger, "jitter": jitter, "misfire_grace": misfire_grace}
+
+    def start(self):
+        """Schedules every job on the running event loop."""
+        for name in self._jobs:
+            self._tasks.append(asyncio.create_task(self._job_loop(name), name=f"scheduler-{name}"))
+        logger.info(f"Async scheduler started with {len(self._jobs)} job(s).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+
+    def _missed_run(self, name, now):
+        job = self._jobs[name]
+        if not job["misfire_grace"]:
+            return None
+        previous = job["trigger"].previous_before(now)
+        last_run = self._state.get(name, {}).get("last_run", 0)
+        if previous and previous.timestamp() > last_run and (now - previous).total_seconds() <= job["misfire_grace"]:
+            return previous
+        return None
+
+    async def _job_loop(self, name):
+        job = self._jobs[name]
+        missed = self._missed_run(name, datetime.now(IST))
+        if missed:
+            logger.info(f"Scheduler: '{name}' missed its {missed:%d %b %H:%M %Z} run, catching up now.")
+            await self.run_now(name)
+
+        while True:
+            next_run = job["trigger"].next_after(datetime.now(IST))
+            delay = (next_run - datetime.now(IST)).total_seconds() + random.uniform(0, job["jitter"])
+            logger.info(f"Scheduler: next '{name}' run at {next_run:%d %b %Y %H:%M %Z} (in {delay / 60:.0f} min).")
+            await asyncio.sleep(max(0, delay))
+            await self.run_now(name)
+
+    async def run_now(self, name):
+        """Runs the job in the worker pool unless a previous run is still going."""
+        if name in self._running:
+            logger.warning(f"Scheduler: '{name}' is still running, skipping this trigger.")
+            return None
+        self._running.add(name)
+        started = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._jobs[name]["fn"])
         except Exception as e:
-            logger.error(f"❌ Scheduled Job Error: offset {day} - {e}")
+            logger.error(f"Scheduler: '{name}' failed - {e}")
+        finally:
+            self._running.discard(name)
+            self._state[name] = {"last_run": started, "duration": round(time.time() - started, 1)}
+            self._save_state()
+
 
-    logger.info("Daily scheduled pre-fetch job completed!")
+_scheduler = None
 
-def run_scheduler():
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
 
-def start_scheduler():
+def start_scheduler() -> AsyncScheduler:
     """
-    Starts the scheduler background thread.
+    Starts the daily prefetch on the running event loop (call from PTB's post_init).
+    Times are Asia/Kolkata regardless of the server timezone.
     """
-    # Run every day at 08:00 AM server time (Assuming Server time is IST for this system setting)
-    # The default system time of Windows is typically what schedule reads unless overridden
-    schedule.every().day.at("08:00").do(prefetch_daily_data)
-    
-    thread = threading.Thread(target=run_scheduler, daemon=True)
-    thread.start()
-    logger.info("Schedule thread started! Daily fetch set for 08:00.")
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    _scheduler = AsyncScheduler()
+    _scheduler.add_job(
+        "prefetch_daily_data",
+        prefetch_daily_data,
+        CronTrigger(PREFETCH_CRON),
+        jitter=PREFETCH_JITTER_SECONDS,
+        misfire_grace=PREFETCH_MISFIRE_GRACE,
+    )
+    _scheduler.start()
+    logger.info(f"Daily fetch set for '{PREFETCH_CRON}' (Asia/Kolkata).")
+    return _scheduler
+
+
+async def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    start_scheduler()
-    while True:
-        time.sleep(1)
+
+    async def run_forever():
+        start_scheduler()
+        await asyncio.Event().wait()
+
+    asyncio.run(run_forever())
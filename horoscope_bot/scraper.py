@@ -1,17 +1,11 @@
-
-import requests
-from bs4 import BeautifulSoup
 import logging
-import concurrent.futures
+import asyncio
+import random
 import os
-from dotenv import load_dotenv
-
+import httpx
+from singleflight import SingleFlight
+from metrics import span, count_cache
 
-# Load environment variables
-load_dotenv("conf.env")
-
-# Configure logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ZODIAC_SIGNS = [
@@ -19,142 +13,267 @@ ZODIAC_SIGNS = [
     "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces"
 ]
 
-def fetch_horoscope(sign: str, day: int = 0):
+BASE_URL = "https://astrology.com.au/horoscopes/daily-horoscopes"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Async scraping knobs
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "12"))
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "3"))
+SCRAPE_BACKOFF_BASE = float(os.getenv("SCRAPE_BACKOFF_BASE", "0.5"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "10"))
+
+# url -> (etag, last_modified, parsed result) for conditional GETs
+_conditional_cache = {}
+
+# Coalesces concurrent scrapes/translations of the same (date, language)
+_data_flight = SingleFlight("horoscope-data")
+
+# One pooled client per event loop (httpx clients cannot be shared across loops)
+_async_clients = {}
+
+
+def horoscope_url(sign: str, day: int) -> str:
+    # URL structure: ?day=0 (today), ?day=1 (tomorrow)
+    return f"{BASE_URL}/{sign}?day={day}"
+
+
+def _parse_horoscope(sign: str, day: int, content: bytes):
+    # Precompiled lxml XPath by default; SCRAPE_PARSER=bs4 switches back to BeautifulSoup
+    from extractor import extract
+    date, text = extract(content, sign)
+
+    if not text:
+        logger.warning(f"Could not retrieve text for {sign} on day {day}. Text div missing or empty.")
+        return {"sign": sign, "text": "Could not retrieve text.", "date": "Unknown", "count": 0}
+
+    count = len(text)
+    logger.info(f"Successfully scraped {sign} (Day {day}, length: {count})")
+    return {"sign": sign, "text": text, "date": date, "count": count}
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=SCRAPE_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=SCRAPE_CONCURRENCY, max_keepalive_connections=SCRAPE_CONCURRENCY),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Closes the pooled client of the running event loop."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_sync(coro):
+    """Runs a scraper coroutine from synchronous code on a private, cleaned-up event loop."""
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+    return asyncio.run(runner())
+
+
+async def _get_with_retries(url: str):
+    """
+    GET with jittered exponential backoff on timeouts, transport errors and 5xx.
+    Sends If-None-Match / If-Modified-Since when we have seen the page before.
+    """
+    client = get_async_client()
+    headers = {}
+    cached = _conditional_cache.get(url)
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    for attempt in range(SCRAPE_RETRIES + 1):
+        try:
+            response = await client.get(url, headers=headers)
+            if response.status_code < 500:
+                return response
+            error = f"HTTP {response.status_code}"
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            error = repr(e)
+
+        if attempt < SCRAPE_RETRIES:
+            delay = SCRAPE_BACKOFF_BASE * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning(f"Retrying {url} in {delay:.2f}s after {error} (attempt {attempt + 1}/{SCRAPE_RETRIES})")
+            await asyncio.sleep(delay)
+
+    raise RuntimeError(f"Giving up on {url} after {SCRAPE_RETRIES + 1} attempts: {error}")
+
+
+async def fetch_horoscope_async(sign: str, day: int = 0):
     """
-    Fetches the horoscope for the given zodiac sign.
+    Fetches the horoscope for the given zodiac sign on a pooled keep-alive client.
     day: 0 for Today, 1 for Tomorrow.
     """
     sign = sign.lower()
-    # URL structure: ?day=0 (today), ?day=1 (tomorrow)
-    url = f"https://astrology.com.au/horoscopes/daily-horoscopes/{sign}?day={day}"
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
+    url = horoscope_url(sign, day)
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = await _get_with_retries(url)
+        if response.status_code == 304 and url in _conditional_cache:
+            logger.info(f"Not modified: {sign} (Day {day}), reusing previous parse.")
+            return dict(_conditional_cache[url][2])
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        text = ""
-        date = ""
-        
-        # Extract Date
-        # Based on analysis, date is in <h3 class="center" style="text-align: center;">14 January 2026</h3>
-        date_elem = soup.select_one('h3.center')
-        if date_elem:
-            date = date_elem.get_text(strip=True)
-
-        # Strategy 1: Primary Target (Full Text)
-        full_text_div = soup.select_one('div.daily-horoscope-text')
-        if full_text_div:
-            text = full_text_div.get_text(separator=' ', strip=True)
-            # Extra cleanup
-            text = " ".join(text.split())
-        else:
-            # Strategy 2: Fallback Target (Sidebar Summary)
-            sidebar_div = soup.select_one(f'div#day_{sign} p')
-            if sidebar_div:
-                text = sidebar_div.get_text(separator="\n", strip=True)
-                # If we are falling back, it might not be specific to "tomorrow" if the sidebar doesn't update dynamically via JS query param,
-                # but this is the best effort given the structure.
-        
-        if not text:
-            logger.warning(f"Could not retrieve text for {sign} on day {day}. Text div missing or empty.")
-            return {"sign": sign, "text": "Could not retrieve text.", "date": "Unknown", "count": 0}
-
-        count = len(text)
-        logger.info(f"Successfully scraped {sign} (Day {day}, length: {count})")
-        return {"sign": sign, "text": text, "date": date, "count": count}
 
+        # Parsing is CPU bound, keep it off the event loop
+        result = await asyncio.to_thread(_parse_horoscope, sign, day, response.content)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if (etag or last_modified) and result.get("count"):
+            _conditional_cache[url] = (etag, last_modified, dict(result))
+        return result
 
     except Exception as e:
         logger.error(f"Error fetching {sign} (Day {day}): {e}")
         return {"sign": sign, "text": "Error fetching data.", "count": 0}
 
 
+async def scrape_offsets_async(offsets=(-1, 0, 1)):
+    """
+    Fetches every sign for every offset in one batch (36 pages for -1/0/+1),
+    bounded by SCRAPE_CONCURRENCY. Concurrent batches are admitted through the
+    "scrape" gate (raises admission.Overloaded when its queue is full).
+    Returns {offset: [results in ZODIAC_SIGNS order]}.
+    """
+    semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+
+    async def bounded(sign, day):
+        async with semaphore:
+            return await fetch_horoscope_async(sign, day)
+
+    pairs = [(day, sign) for day in offsets for sign in ZODIAC_SIGNS]
+    from admission import get_gate
+    async with get_gate("scrape").slot_async():
+        results = await asyncio.gather(*(bounded(sign, day) for day, sign in pairs))
 
-def _scrape_offset(day: int):
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-        future_to_sign = {executor.submit(fetch_horoscope, sign, day): sign for sign in ZODIAC_SIGNS}
-        for future in concurrent.futures.as_completed(future_to_sign):
-            try:
-                data = future.result()
-                results.append(data)
-            except Exception as exc:
-                logger.error(f"Generated an exception: {exc}")
-    results.sort(key=lambda x: ZODIAC_SIGNS.index(x['sign']))
-    return results
+    by_offset = {day: [] for day in offsets}
+    for (day, _), data in zip(pairs, results):
+        by_offset[day].append(data)
+    return by_offset
 
-def get_horoscopes_by_date(target_date: str, language: str = "english", fallback_offset: int = None):
+
+async def scrape_offset_async(day: int):
+    return (await scrape_offsets_async([day]))[day]
+
+
+def _translate_results(results):
+    # All 12 readings go out as one batch (chunked to provider limits)
+    from translator import translate_batch
+    translations = translate_batch([res['text'] for res in results], source="en", target="te")
+    telugu_results = []
+    for res, text in zip(results, translations):
+        telugu_res = res.copy()
+        telugu_res['text'] = text
+        telugu_results.append(telugu_res)
+    return telugu_results
+
+
+async def get_horoscopes_by_date_async(target_date: str, language: str = "english", fallback_offset: int = None):
     """
     Fetches horoscopes exactly by the target date string.
     If not in DB, it scrapes using the optionally provided fallback_offset and caches it.
+    Awaitable directly from the Telegram handlers; blocking DB and translation calls run in threads.
+    Concurrent requests for the same (date, language) share a single fetch.
     """
+    with span("get_horoscopes", language=language):
+        return await _data_flight.do_async(
+            (target_date, language), _get_horoscopes_by_date_async, target_date, language, fallback_offset
+        )
+
+
+async def _get_horoscopes_by_date_async(target_date: str, language: str, fallback_offset: int):
     import db
-    
+
     # 1. Check DB Cache explicitly for this date and language
-    cached_data = db.get_horoscopes(target_date, language=language)
+    cached_data = await asyncio.to_thread(db.get_horoscopes, target_date, language=language)
+    count_cache("horoscopes", bool(cached_data), language=language)
     if cached_data:
         logger.info(f"Returning CACHED data for {target_date} ({language}).")
         return cached_data
 
     logger.info(f"No {language} cache found for {target_date}. Need to fetch/translate...")
-    
+
     # If asking for Telugu, we can check if English is cached first to save scraping time
     if language == "telugu":
-        english_data = db.get_horoscopes(target_date, language="english")
+        english_data = await asyncio.to_thread(db.get_horoscopes, target_date, language="english")
         if english_data:
-            from translator import translate_to_telugu
             logger.info("Translating existing English DB cache to Telugu...")
-            telugu_results = []
-            for res in english_data:
-                telugu_res = res.copy()
-                telugu_res['text'] = translate_to_telugu(res['text'])
-                telugu_results.append(telugu_res)
-            db.save_horoscopes(target_date, telugu_results, language="telugu")
+            with span("translate"):
+                telugu_results = await asyncio.to_thread(_translate_results, english_data)
+            await asyncio.to_thread(db.save_horoscopes, target_date, telugu_results, language="telugu")
             return telugu_results
-            
+
     # 2. Not in Cache - Fetch From Website ONLY if we have an offset
     if fallback_offset is not None:
         logger.info(f"Scraping source website offset {fallback_offset} for expected date {target_date}...")
-        results = _scrape_offset(fallback_offset)
-        
-        if results and len(results) == 12:
-            fetched_date = results[0].get('date', target_date)
-            
-            # Save English baseline to DB 
+        with span("scrape"):
+            results = await scrape_offset_async(fallback_offset)
+
+        # Failed fetches still come back as placeholder readings with count 0
+        if results and len(results) == 12 and all(res.get('count') for res in results):
+            fetched_date = results[0].get('date') or target_date
+
+            # A stale date memo points the offset at another day; never serve, store or
+            # cache an album of that day's readings under the requested date
+            if fetched_date != target_date:
+                logger.warning(f"Offset {fallback_offset} now serves {fetched_date}, not {target_date}. Dropping stale date mapping.")
+                import dates
+                dates.invalidate()
+                return None
+
+            # Save English baseline to DB
             logger.info(f"Saving scraped English data for {fetched_date} into DB.")
-            db.save_horoscopes(fetched_date, results, language="english")
-            db.cleanup_old_horoscopes(1, language="english")
-            
+            await asyncio.to_thread(db.save_horoscopes, fetched_date, results, language="english")
+            await asyncio.to_thread(db.cleanup_old_horoscopes, language="english")
+
             if language == "telugu":
-                from translator import translate_to_telugu
                 logger.info("Translating freshly scraped data to Telugu...")
-                telugu_results = []
-                for res in results:
-                    telugu_res = res.copy()
-                    telugu_res['text'] = translate_to_telugu(res['text'])
-                    telugu_results.append(telugu_res)
-                db.save_horoscopes(fetched_date, telugu_results, language="telugu")
-                db.cleanup_old_horoscopes(1, language="telugu")
+                with span("translate"):
+                    telugu_results = await asyncio.to_thread(_translate_results, results)
+                await asyncio.to_thread(db.save_horoscopes, fetched_date, telugu_results, language="telugu")
+                await asyncio.to_thread(db.cleanup_old_horoscopes, language="telugu")
                 return telugu_results
-            
+
             return results
         else:
-            logger.warning("Scrape failed to return 12 signs.")
-            
+            logger.warning("Scrape failed to return all 12 signs.")
+
     return None
 
+
+def get_horoscopes_by_date(target_date: str, language: str = "english", fallback_offset: int = None):
+    """
+    Synchronous wrapper around get_horoscopes_by_date_async for threads and scripts.
+    """
+    return run_sync(get_horoscopes_by_date_async(target_date, language, fallback_offset))
+
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv("conf.env")
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
     # Test run for Today
     print("Fetching Today's Horoscopes...")
     daily_results = get_horoscopes_by_date("28 February 2026", fallback_offset=0)
     if daily_results:
-        for res in daily_results[:2]: 
+        for res in daily_results[:2]:
             print(f"--- {res['sign'].upper()} ---")
             print(res['text'])
             print(f"Count: {res['count']}\n")
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the work,
+    everyone arriving while it is in flight waits for and shares its result
+    (or exception). Nothing is cached once the call completes.
+
+    Works from plain threads (`do`) and from coroutines (`do_async`), including
+    callers on different event loops, because waiters block on a
+    concurrent.futures.Future.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def _claim(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.executed += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        future, leader = self._claim(key)
+        if not leader:
+            logger.info(f"[{self.name}] Joining in-flight call for {key}")
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        future, leader = self._claim(key)
+        if not leader:
+            logger.info(f"[{self.name}] Joining in-flight call for {key}")
+            return await asyncio.wrap_future(future)
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "executed": self.executed, "shared": self.shared}
@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Reference point for the startup report: the moment the process began importing the bot
+PROCESS_START = time.perf_counter()
+
+
+# Read on call rather than at import: conf.env is only loaded once main() runs.
+def startup_mode() -> str:
+    """
+    STARTUP_MODE: "background" (default) warms heavy subsystems in a thread right after
+    launch, "lazy" leaves each one to initialize on its first real use.
+    """
+    return os.getenv("STARTUP_MODE", "background").lower()
+
+
+def browser_ready_timeout() -> float:
+    """How long the warm-up thread waits for the first Chromium before reporting it as pending."""
+    return float(os.getenv("BROWSER_READY_TIMEOUT", "60"))
+
+
+_timings = {}
+_lock = threading.Lock()
+
+
+def elapsed_ms() -> float:
+    return (time.perf_counter() - PROCESS_START) * 1000
+
+
+def record(name: str, duration_ms: float, status: str = "ok"):
+    with _lock:
+        _timings[name] = {"ms": round(duration_ms, 1), "status": status, "at_ms": round(elapsed_ms(), 1)}
+
+
+def mark(name: str):
+    """Records a milestone measured from process start (e.g. "polling")."""
+    record(name, elapsed_ms())
+
+
+def run_step(name: str, fn):
+    """Runs one warm-up step, timing it and logging instead of raising on failure."""
+    started = time.perf_counter()
+    try:
+        result = fn()
+        status = "ok" if result is not False else "pending"
+    except Exception as e:
+        logger.error(f"Startup step '{name}' failed: {e}")
+        status = "failed"
+    record(name, (time.perf_counter() - started) * 1000, status)
+
+
+def report() -> dict:
+    with _lock:
+        return {name: dict(entry) for name, entry in _timings.items()}
+
+
+def log_report(title: str = "Startup report"):
+    parts = [f"{name}={entry['ms']:.0f}ms ({entry['status']})" for name, entry in report().items()]
+    logger.info(f"{title}: {', '.join(parts) or 'nothing recorded'}")
+
+
+def warm_up_in_background(steps) -> threading.Thread:
+    """
+    Runs the (name, callable) warm-up steps one after another on a daemon thread and
+    logs the startup report once they are done. Polling does not wait for any of them.
+    """
+    def runner():
+        for name, fn in steps:
+            run_step(name, fn)
+        log_report()
+
+    thread = threading.Thread(target=runner, name="startup-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,394 @@
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Website formats dates as "24 February 2026"
+DATE_FORMAT = "%d %B %Y"
+
+LANGUAGES = ("english", "telugu")
+
+
+def parse_date(date_str: str):
+    """Typed form of a website date string (midnight, naive UTC), or None."""
+    try:
+        return datetime.strptime(date_str, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+class StorageBackend:
+    """
+    Persistence primitives behind db.py. Backends raise on failure; db.py owns
+    logging, the in-process cache and the "storage disabled" fallbacks.
+    """
+
+    name = "base"
+
+    def get_horoscopes(self, target_date, language):
+        raise NotImplementedError
+
+    def save_horoscopes(self, target_date, readings, language):
+        raise NotImplementedError
+
+    def get_available_dates(self, language):
+        """Date strings in chronological order."""
+        raise NotImplementedError
+
+    def delete_older_than(self, cutoff: datetime, language):
+        """Deletes horoscopes dated before `cutoff` and returns the removed date strings."""
+        raise NotImplementedError
+
+    def iter_horoscopes(self, language, start: datetime = None, end: datetime = None):
+        """Streams (date string, readings) in chronological order, optionally within [start, end]."""
+        raise NotImplementedError
+
+    def bulk_save_horoscopes(self, items, language):
+        """Upserts many (date string, readings) pairs in batched round trips."""
+        raise NotImplementedError
+
+    def get_album_file_ids(self, target_date, template_id, language):
+        raise NotImplementedError
+
+    def save_album_file_ids(self, target_date, template_id, language, file_ids):
+        raise NotImplementedError
+
+    def delete_albums(self, dates, language):
+        raise NotImplementedError
+
+    def get_translations(self, keys):
+        raise NotImplementedError
+
+    def save_translations(self, mapping):
+        raise NotImplementedError
+
+    def get_render_blob(self, key):
+        raise NotImplementedError
+
+    def save_render_blob(self, key, data):
+        raise NotImplementedError
+
+
+class MongoBackend(StorageBackend):
+    """MongoDB Atlas: one collection per language, GridFS for rendered pages."""
+
+    name = "mongo"
+
+    def __init__(self, uri: str):
+        from pymongo import MongoClient
+        from pymongo.server_api import ServerApi
+        self.client = MongoClient(uri, server_api=ServerApi('1'))
+        self.db = self.client['horoscope_db']
+        # Send a ping to confirm a successful connection
+        self.client.admin.command('ping')
+        logger.info("Pinged your deployment. You successfully connected to MongoDB!")
+        self._ensure_indexes()
+
+    def _collection(self, language):
+        # english -> horoscopes_en, telugu -> horoscopes_te
+        suffix = 'en' if language.lower() == 'english' else 'te'
+        return self.db[f'horoscopes_{suffix}']
+
+    def _albums(self):
+        return self.db['telegram_albums']
+
+    def _ensure_indexes(self):
+        """
+        Unique index on the date string and an index on the typed date for range queries,
+        per language collection. Also backfills `date_value` on documents written before it existed.
+        """
+        try:
+            for language in LANGUAGES:
+                coll = self._collection(language)
+                for doc in coll.find({"date_value": {"$exists": False}}, {"date": 1}):
+                    coll.update_one({"_id": doc["_id"]}, {"$set": {"date_value": parse_date(doc.get("date"))}})
+                coll.create_index("date", unique=True)
+                coll.create_index("date_value")
+            self._albums().create_index(
+                [("date", 1), ("template_id", 1), ("language", 1)], unique=True
+            )
+        except Exception as e:
+            logger.error(f"Error creating MongoDB indexes: {e}")
+
+    def get_horoscopes(self, target_date, language):
+        data = self._collection(language).find_one({"date": target_date})
+        if data and "readings" in data:
+            return data["readings"]
+        return None
+
+    def save_horoscopes(self, target_date, readings, language):
+        document = {
+            "date": target_date,
+            "date_value": parse_date(target_date),
+            "readings": readings,
+            "language": language,
+            "created_at": datetime.utcnow()
+        }
+        self._collection(language).update_one(
+            {"date": target_date},
+            {"$set": document},
+            upsert=True
+        )
+
+    def get_available_dates(self, language):
+        # Chronological order straight from the date_value index
+        cursor = self._collection(language).find({}, {"date": 1, "_id": 0}).sort("date_value", 1)
+        return [doc["date"] for doc in cursor]
+
+    def delete_older_than(self, cutoff, language):
+        coll = self._collection(language)
+        stale_filter = {"date_value": {"$lt": cutoff}}
+        stale_dates = coll.distinct("date", stale_filter)
+        if stale_dates:
+            coll.delete_many(stale_filter)
+        return stale_dates
+
+    def iter_horoscopes(self, language, start=None, end=None):
+        query = {}
+        date_range = {op: value for op, value in (("$gte", start), ("$lte", end)) if value is not None}
+        if date_range:
+            query["date_value"] = date_range
+        cursor = self._collection(language).find(query, {"date": 1, "readings": 1, "_id": 0}).sort("date_value", 1).batch_size(100)
+        for doc in cursor:
+            yield doc["date"], doc.get("readings", [])
+
+    def bulk_save_horoscopes(self, items, language):
+        from pymongo import UpdateOne
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne(
+                {"date": target_date},
+                {"$set": {
+                    "date": target_date,
+                    "date_value": parse_date(target_date),
+                    "readings": readings,
+                    "language": language,
+                    "created_at": now
+                }},
+                upsert=True
+            )
+            for target_date, readings in items
+        ]
+        if ops:
+            self._collection(language).bulk_write(ops, ordered=False)
+
+    def get_album_file_ids(self, target_date, template_id, language):
+        data = self._albums().find_one({"date": target_date, "template_id": template_id, "language": language})
+        return data.get("file_ids") if data else None
+
+    def save_album_file_ids(self, target_date, template_id, language, file_ids):
+        self._albums().update_one(
+            {"date": target_date, "template_id": template_id, "language": language},
+            {"$set": {
+                "date": target_date,
+                "template_id": template_id,
+                "language": language,
+                "file_ids": file_ids,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    def delete_albums(self, dates, language):
+        self._albums().delete_many({"date": {"$in": list(dates)}, "language": language})
+
+    def get_translations(self, keys):
+        docs = self.db['translations'].find({"_id": {"$in": list(keys)}})
+        return {doc["_id"]: doc["text"] for doc in docs}
+
+    def save_translations(self, mapping):
+        from pymongo import UpdateOne
+        ops = [
+            UpdateOne({"_id": key}, {"$set": {"text": text, "created_at": datetime.utcnow()}}, upsert=True)
+            for key, text in mapping.items()
+        ]
+        self.db['translations'].bulk_write(ops, ordered=False)
+
+    def get_render_blob(self, key):
+        import gridfs
+        fs = gridfs.GridFS(self.db, collection="render_cache")
+        grid_out = fs.find_one({"filename": key})
+        return grid_out.read() if grid_out else None
+
+    def save_render_blob(self, key, data):
+        import gridfs
+        fs = gridfs.GridFS(self.db, collection="render_cache")
+        # Content-addressed, so each key is written once
+        if not fs.exists({"filename": key}):
+            fs.put(data, filename=key, created_at=datetime.utcnow())
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Embedded single-file store for single-node deployments and offline runs.
+    WAL mode lets readers proceed while a write is in progress.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS horoscopes (
+            language TEXT NOT NULL,
+            date TEXT NOT NULL,
+            date_value TEXT,
+            readings TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (language, date)
+        );
+        CREATE INDEX IF NOT EXISTS idx_horoscopes_date_value ON horoscopes (language, date_value);
+        CREATE TABLE IF NOT EXISTS telegram_albums (
+            date TEXT NOT NULL,
+            template_id TEXT NOT NULL,
+            language TEXT NOT NULL,
+            file_ids TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (date, template_id, language)
+        );
+        CREATE TABLE IF NOT EXISTS translations (
+            key TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS render_cache (
+            key TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            created_at TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        logger.info(f"Opened SQLite storage at {path} (WAL mode).")
+
+    def _connection(self):
+        # One connection per thread: sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    def _write(self, sql, params=()):
+        conn = self._connection()
+        with conn:
+            conn.execute(sql, params)
+
+    def _write_many(self, sql, rows):
+        conn = self._connection()
+        with conn:
+            conn.executemany(sql, rows)
+
+    @staticmethod
+    def _date_value(target_date):
+        parsed = parse_date(target_date)
+        return parsed.date().isoformat() if parsed else None
+
+    @staticmethod
+    def _now():
+        return datetime.utcnow().isoformat()
+
+    def get_horoscopes(self, target_date, language):
+        rows = self._query("SELECT readings FROM horoscopes WHERE language = ? AND date = ?", (language, target_date))
+        return json.loads(rows[0][0]) if rows else None
+
+    def save_horoscopes(self, target_date, readings, language):
+        self._write(
+            "INSERT OR REPLACE INTO horoscopes (language, date, date_value, readings, created_at) VALUES (?, ?, ?, ?, ?)",
+            (language, target_date, self._date_value(target_date), json.dumps(readings, ensure_ascii=False), self._now()),
+        )
+
+    def get_available_dates(self, language):
+        rows = self._query("SELECT date FROM horoscopes WHERE language = ? ORDER BY date_value", (language,))
+        return [row[0] for row in rows]
+
+    def delete_older_than(self, cutoff, language):
+        cutoff_value = cutoff.date().isoformat()
+        conn = self._connection()
+        with conn:
+            rows = conn.execute(
+                "SELECT date FROM horoscopes WHERE language = ? AND date_value < ?", (language, cutoff_value)
+            ).fetchall()
+            conn.execute(
+                "DELETE FROM horoscopes WHERE language = ? AND date_value < ?", (language, cutoff_value)
+            )
+        return [row[0] for row in rows]
+
+    def iter_horoscopes(self, language, start=None, end=None):
+        sql = "SELECT date, readings FROM horoscopes WHERE language = ?"
+        params = [language]
+        if start is not None:
+            sql += " AND date_value >= ?"
+            params.append(start.date().isoformat())
+        if end is not None:
+            sql += " AND date_value <= ?"
+            params.append(end.date().isoformat())
+        # Iterate the cursor instead of fetchall() so large archives stream
+        for target_date, readings in self._connection().execute(sql + " ORDER BY date_value", params):
+            yield target_date, json.loads(readings)
+
+    def bulk_save_horoscopes(self, items, language):
+        now = self._now()
+        self._write_many(
+            "INSERT OR REPLACE INTO horoscopes (language, date, date_value, readings, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (language, target_date, self._date_value(target_date), json.dumps(readings, ensure_ascii=False), now)
+                for target_date, readings in items
+            ],
+        )
+
+    def get_album_file_ids(self, target_date, template_id, language):
+        rows = self._query(
+            "SELECT file_ids FROM telegram_albums WHERE date = ? AND template_id = ? AND language = ?",
+            (target_date, template_id, language),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def save_album_file_ids(self, target_date, template_id, language, file_ids):
+        self._write(
+            "INSERT OR REPLACE INTO telegram_albums (date, template_id, language, file_ids, created_at) VALUES (?, ?, ?, ?, ?)",
+            (target_date, template_id, language, json.dumps(file_ids), self._now()),
+        )
+
+    def delete_albums(self, dates, language):
+        self._write_many(
+            "DELETE FROM telegram_albums WHERE date = ? AND language = ?",
+            [(d, language) for d in dates],
+        )
+
+    def get_translations(self, keys):
+        keys = list(keys)
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._query(f"SELECT key, text FROM translations WHERE key IN ({placeholders})", chunk))
+        return found
+
+    def save_translations(self, mapping):
+        now = self._now()
+        self._write_many(
+            "INSERT OR REPLACE INTO translations (key, text, created_at) VALUES (?, ?, ?)",
+            [(key, text, now) for key, text in mapping.items()],
+        )
+
+    def get_render_blob(self, key):
+        rows = self._query("SELECT data FROM render_cache WHERE key = ?", (key,))
+        return bytes(rows[0][0]) if rows else None
+
+    def save_render_blob(self, key, data):
+        self._write(
+            "INSERT OR IGNORE INTO render_cache (key, data, created_at) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(data), self._now()),
+        )
@@ -1,20 +1,348 @@
+import os
+import re
+import json
+import hashlib
 import logging
+import tempfile
+import threading
+import concurrent.futures
 from deep_translator import GoogleTranslator
 
 logger = logging.getLogger(__name__)
 
-def translate_to_telugu(text: str) -> str:
-    """
-    Translates the given English text to Telugu using deep-translator.
-    """
-    try:
-        # deep-translator handles empty/short strings gracefully, often returning the input
-        # or an empty string, so the explicit check might not be strictly necessary
-        # but can be kept if specific behavior is desired.
-        # For now, following the provided new code structure.
-        
-        translator = GoogleTranslator(source='en', target='te')
-        return translator.translate(text)
-    except Exception as e:
-        logger.error(f"Translation Error: {e}")
-        return text # Fallback to original text on failure
+# Google's web endpoint rejects payloads above 5000 characters
+TRANSLATE_CHUNK_CHARS = int(os.getenv("TRANSLATE_CHUNK_CHARS", "4500"))
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "6"))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(BASE_DIR, "translation_memory.json"))
+# Journal entries appended before they are folded back into the snapshot file
+TRANSLATION_MEMORY_COMPACT_EVERY = int(os.getenv("TRANSLATION_MEMORY_COMPACT_EVERY", "500"))
+
+# Backend selection: "google" (deep-translator) or "marian" (local offline model)
+TRANSLATOR_BACKEND = os.getenv("TRANSLATOR_BACKEND", "google").lower()
+# en -> Dravidian OPUS model; Telugu is selected with the >>tel<< source token
+TRANSLATOR_MODEL = os.getenv("TRANSLATOR_MODEL", "Helsinki-NLP/opus-mt-en-dra")
+TRANSLATOR_SOURCE_PREFIX = os.getenv("TRANSLATOR_SOURCE_PREFIX", ">>tel<<")
+TRANSLATOR_CT2_MODEL_DIR = os.getenv("TRANSLATOR_CT2_MODEL_DIR")
+TRANSLATOR_BATCH_SIZE = int(os.getenv("TRANSLATOR_BATCH_SIZE", "16"))
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Joins several readings into one request; each reading comes back between these markers
+BATCH_SEPARATOR = "\n###\n"
+
+
+def _memory_key(text: str, source: str, target: str) -> str:
+    return hashlib.sha256(f"{source}:{target}:{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    Content-hash -> translation store. Kept in memory, persisted to a local JSON snapshot
+    plus an append-only journal of new entries (folded into the snapshot every
+    TRANSLATION_MEMORY_COMPACT_EVERY entries) and, when a storage backend is configured,
+    to its `translations` table/collection.
+    """
+
+    def __init__(self, path: str = TRANSLATION_MEMORY_PATH):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self._entries = {}
+        self._journal_entries = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Could not read translation memory {self.path}: {e}")
+        if os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            delta = json.loads(line)
+                        except ValueError:
+                            # Torn last line from a crash mid-append
+                            continue
+                        self._entries.update(delta)
+                        self._journal_entries += len(delta)
+            except OSError as e:
+                logger.error(f"Could not read translation memory journal {self.journal_path}: {e}")
+        if self._entries:
+            logger.info(f"Translation memory: loaded {len(self._entries)} entries from {self.path}")
+
+    def lookup(self, keys) -> dict:
+        with self._lock:
+            found = {k: self._entries[k] for k in keys if k in self._entries}
+        missing = [k for k in keys if k not in found]
+        if missing:
+            import db
+            remote = db.get_translations(missing)
+            if remote:
+                with self._lock:
+                    self._entries.update(remote)
+                found.update(remote)
+        return found
+
+    def _compact(self):
+        """Rewrites the snapshot from memory and empties the journal. Caller holds the lock."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=directory, prefix=".translation_memory.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            json.dump(self._entries, f, ensure_ascii=False)
+        try:
+            os.replace(tmp_path, self.path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+        open(self.journal_path, "w", encoding="utf-8").close()
+        self._journal_entries = 0
+
+    def store(self, mapping: dict):
+        """Appends only the new entries; the full snapshot is rewritten on compaction."""
+        if not mapping:
+            return
+        with self._lock:
+            self._entries.update(mapping)
+            try:
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(mapping, ensure_ascii=False) + "\n")
+                self._journal_entries += len(mapping)
+                if self._journal_entries >= TRANSLATION_MEMORY_COMPACT_EVERY:
+                    self._compact()
+            except Exception as e:
+                logger.error(f"Could not write translation memory {self.path}: {e}")
+        import db
+        db.save_translations(mapping)
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> TranslationMemory:
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
+
+
+class TranslatorBackend:
+    """
+    Interface for translation providers. `translate_many` returns one entry per input,
+    with None for items that could not be translated.
+    """
+
+    name = "base"
+
+    def warmup(self):
+        """Loads anything expensive up front (models, sessions). Optional."""
+
+    def translate_many(self, texts, source, target) -> list:
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslatorBackend):
+    """Google Translate through deep-translator (network, rate limited)."""
+
+    name = "google"
+
+    def _translate(self, text, source, target):
+        return GoogleTranslator(source=source, target=target).translate(text)
+
+    def _chunk(self, texts):
+        """Groups texts so each joined request stays under TRANSLATE_CHUNK_CHARS."""
+        chunks, current, size = [], [], 0
+        for text in texts:
+            extra = len(text) + len(BATCH_SEPARATOR)
+            if current and size + extra > TRANSLATE_CHUNK_CHARS:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(text)
+            size += extra
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _translate_one(self, text, source, target):
+        try:
+            return self._translate(text, source, target)
+        except Exception as e:
+            logger.error(f"Translation Error: {e}")
+            return None
+
+    def _translate_chunk(self, texts, source, target):
+        """
+        One request for the whole chunk. Returns None when the provider mangles the
+        separators (or the request fails) so the items can be translated individually.
+        """
+        if len(texts) == 1:
+            return [self._translate_one(texts[0], source, target)]
+        try:
+            joined = self._translate(BATCH_SEPARATOR.join(texts), source, target)
+            parts = [p.strip() for p in joined.split("###")] if joined else []
+            if len(parts) == len(texts) and all(parts):
+                return parts
+            logger.warning(f"Batch translation returned {len(parts)} parts for {len(texts)} texts, retrying individually.")
+        except Exception as e:
+            logger.error(f"Batch translation error: {e}")
+        return None
+
+    def translate_many(self, texts, source, target):
+        chunks = self._chunk(texts)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=TRANSLATE_CONCURRENCY) as executor:
+            translated_chunks = list(executor.map(lambda c: self._translate_chunk(c, source, target), chunks))
+            # Chunks that could not be batched go out one request per item, still in parallel
+            retries = {
+                idx: [executor.submit(self._translate_one, text, source, target) for text in chunk]
+                for idx, chunk in enumerate(chunks)
+                if translated_chunks[idx] is None
+            }
+            for idx, futures in retries.items():
+                translated_chunks[idx] = [f.result() for f in futures]
+        return [t for chunk in translated_chunks for t in chunk]
+
+
+class MarianBackend(TranslatorBackend):
+    """
+    Offline CPU translation with a MarianMT model, loaded once and run batched.
+
+    Uses CTranslate2 when TRANSLATOR_CT2_MODEL_DIR points at a converted model,
+    otherwise plain transformers/PyTorch. Neither is in requirements.txt; install
+    `transformers sentencepiece` plus `ctranslate2` or `torch` to enable it.
+    """
+
+    name = "marian"
+
+    def __init__(self, model_name=TRANSLATOR_MODEL, ct2_model_dir=TRANSLATOR_CT2_MODEL_DIR, source_prefix=TRANSLATOR_SOURCE_PREFIX, batch_size=TRANSLATOR_BATCH_SIZE):
+        self.model_name = model_name
+        self.ct2_model_dir = ct2_model_dir
+        self.source_prefix = source_prefix
+        self.batch_size = max(1, batch_size)
+        self._tokenizer = None
+        self._model = None
+        self._ct2 = None
+        self._lock = threading.Lock()
+
+    def warmup(self):
+        with self._lock:
+            if self._tokenizer is not None:
+                return
+            from transformers import MarianTokenizer
+            tokenizer = MarianTokenizer.from_pretrained(self.model_name)
+            if self.ct2_model_dir:
+                import ctranslate2
+                self._ct2 = ctranslate2.Translator(self.ct2_model_dir, device="cpu")
+                logger.info(f"Loaded CTranslate2 model from {self.ct2_model_dir}")
+            else:
+                from transformers import MarianMTModel
+                self._model = MarianMTModel.from_pretrained(self.model_name)
+                self._model.eval()
+                logger.info(f"Loaded MarianMT model {self.model_name}")
+            # Set last: a loaded tokenizer marks the backend as ready
+            self._tokenizer = tokenizer
+
+    def _generate(self, sentences):
+        tokenizer = self._tokenizer
+        if self._ct2 is not None:
+            tokens = [tokenizer.convert_ids_to_tokens(tokenizer.encode(s)) for s in sentences]
+            results = self._ct2.translate_batch(tokens, max_batch_size=self.batch_size)
+            return [
+                tokenizer.decode(tokenizer.convert_tokens_to_ids(r.hypotheses[0]), skip_special_tokens=True)
+                for r in results
+            ]
+
+        import torch
+        outputs = []
+        for i in range(0, len(sentences), self.batch_size):
+            batch = tokenizer(sentences[i:i + self.batch_size], return_tensors="pt", padding=True, truncation=True)
+            with torch.no_grad():
+                generated = self._model.generate(**batch)
+            outputs.extend(tokenizer.batch_decode(generated, skip_special_tokens=True))
+        return outputs
+
+    def translate_many(self, texts, source, target):
+        self.warmup()
+        # Marian models are trained on sentences; split, translate everything in one batch, rejoin
+        split_texts = [[s for s in SENTENCE_SPLIT_RE.split(text) if s.strip()] for text in texts]
+        sentences = [f"{self.source_prefix} {s}".strip() for parts in split_texts for s in parts]
+        try:
+            translated = self._generate(sentences)
+        except Exception as e:
+            logger.error(f"Local translation error: {e}")
+            return [None] * len(texts)
+
+        results, pos = [], 0
+        for parts in split_texts:
+            results.append(" ".join(translated[pos:pos + len(parts)]) or None)
+            pos += len(parts)
+        return results
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "marian": MarianBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> TranslatorBackend:
+    """Returns the backend selected by TRANSLATOR_BACKEND (google by default)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_cls = BACKENDS.get(TRANSLATOR_BACKEND)
+            if backend_cls is None:
+                logger.error(f"Unknown TRANSLATOR_BACKEND '{TRANSLATOR_BACKEND}', using google.")
+                backend_cls = GoogleBackend
+            _backend = backend_cls()
+            try:
+                _backend.warmup()
+            except Exception as e:
+                logger.error(f"Translator backend '{_backend.name}' failed to load ({e}), using google.")
+                _backend = GoogleBackend()
+            logger.info(f"Translator backend: {_backend.name}")
+        return _backend
+
+
+def translate_batch(texts, source: str = "en", target: str = "te") -> list:
+    """
+    Translates a list of texts with as few backend calls as possible.
+    Identical texts are served from the translation memory.
+    Failed items fall back to the original text (and are not memorized).
+    Backend calls go through the "translate" admission gate.
+    """
+    memory = get_translation_memory()
+    keys = [_memory_key(t, source, target) for t in texts]
+    known = memory.lookup(list(dict.fromkeys(keys)))
+
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in known and key not in pending and text and text.strip():
+            pending[key] = text
+
+    if pending:
+        from admission import get_gate
+        backend = get_backend()
+        with get_gate("translate").slot():
+            logger.info(f"Translating {len(pending)} new text(s) via {backend.name} ({len(texts) - len(pending)} from translation memory)...")
+            translated = backend.translate_many(list(pending.values()), source, target)
+
+        fresh = {}
+        for key, result in zip(pending.keys(), translated):
+            if result:
+                fresh[key] = result
+        memory.store(fresh)
+        known.update(fresh)
+
+    return [known.get(key, text) for key, text in zip(keys, texts)]
@@ -0,0 +1,88 @@
+import asyncio
+
+from admission import Gate
+
+
+def test_cancelled_waiter_racing_release_frees_slot_once():
+    # Exact interleaving: the waiter's future is cancelled, the holder releases
+    # (popping and skipping it) and only then does the waiter run _abandon
+    gate = Gate("test", limit=1, max_queue=5)
+    assert gate._enter() is None
+    future = gate._enter()
+    assert future is not None
+
+    assert future.cancel()
+    gate.release()
+    gate._abandon(future)
+
+    stats = gate.stats()
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_waiter_cancelled_while_holder_releases_keeps_limit():
+    gate = Gate("test", limit=1, max_queue=5)
+
+    async def scenario():
+        holder_inside = asyncio.Event()
+        holder_release = asyncio.Event()
+
+        async def holder():
+            async with gate.slot_async():
+                holder_inside.set()
+                await holder_release.wait()
+
+        async def waiter():
+            async with gate.slot_async():
+                pass
+
+        holder_task = asyncio.create_task(holder())
+        await holder_inside.wait()
+        waiter_task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert gate.stats()["waiting"] == 1
+
+        # Cancel the queued waiter and let the holder leave in the same loop iteration
+        waiter_task.cancel()
+        holder_release.set()
+        await asyncio.gather(holder_task, waiter_task, return_exceptions=True)
+        assert waiter_task.cancelled()
+
+        stats = gate.stats()
+        assert stats["active"] == 0
+        assert stats["waiting"] == 0
+
+        # The gate still admits exactly `limit` callers
+        inside = 0
+        peak = 0
+
+        async def worker():
+            nonlocal inside, peak
+            async with gate.slot_async():
+                inside += 1
+                peak = max(peak, inside)
+                await asyncio.sleep(0.01)
+                inside -= 1
+
+        await asyncio.gather(*(worker() for _ in range(4)))
+        assert peak == 1
+        assert gate.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_granted_slot_of_abandoned_waiter_is_passed_on():
+    gate = Gate("test", limit=1, max_queue=5)
+    assert gate._enter() is None
+    first = gate._enter()
+    second = gate._enter()
+
+    # The holder hands its slot to `first`, which gives up before using it
+    gate.release()
+    assert first.result() is True
+    gate._abandon(first)
+
+    assert second.result() is True
+    assert gate.stats()["active"] == 1
+    gate.release()
+    assert gate.stats()["active"] == 0
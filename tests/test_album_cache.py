@@ -0,0 +1,63 @@
+import io
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+album_cache = pytest.importorskip("album_cache")
+
+CACHE_CHAT = "-100"
+
+
+class RecordingBot:
+    def __init__(self, fail_page=None):
+        self.fail_page = fail_page
+        self.chats = {}
+        self._ids = itertools.count(1)
+
+    def _post(self, chat_id, count):
+        messages = []
+        for _ in range(count):
+            message_id = next(self._ids)
+            self.chats.setdefault(str(chat_id), []).append(message_id)
+            messages.append(SimpleNamespace(message_id=message_id, photo=[SimpleNamespace(file_id=f"file-{message_id}")]))
+        return messages
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        if photo.name == self.fail_page:
+            raise RuntimeError("upload failed")
+        return self._post(chat_id, 1)[0]
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        return self._post(chat_id, len(media))
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        remaining = self.chats.get(str(chat_id), [])
+        self.chats[str(chat_id)] = [m for m in remaining if m not in message_ids]
+        return True
+
+
+def _render(pages):
+    def render(on_page):
+        images = []
+        for idx in range(pages):
+            on_page(idx, b"jpeg")
+            buffer = io.BytesIO(b"jpeg")
+            buffer.name = f"horoscope_{idx + 1}.jpg"
+            images.append(buffer)
+        return images
+    return render
+
+
+@pytest.mark.parametrize("fail_page", [None, "horoscope_2.jpg"])
+def test_preuploaded_pages_are_deleted_from_cache_chat(monkeypatch, fail_page):
+    monkeypatch.setenv("CACHE_CHAT_ID", CACHE_CHAT)
+    bot = RecordingBot(fail_page=fail_page)
+
+    file_ids = asyncio.run(album_cache.deliver_album(bot, 42, _render(3), 3))
+
+    assert bot.chats.get(CACHE_CHAT, []) == []
+    assert len(bot.chats["42"]) == 3
+    # The returned file_ids are those of the user's own album
+    assert file_ids == [f"file-{m}" for m in bot.chats["42"]]
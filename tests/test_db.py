@@ -0,0 +1,16 @@
+import pytest
+
+db = pytest.importorskip("db")
+
+
+def test_retention_days_parses_and_disables(monkeypatch):
+    monkeypatch.setenv("RETENTION_DAYS", "7")
+    assert db.retention_days() == 7
+    monkeypatch.setenv("RETENTION_DAYS", "forever")
+    assert db.retention_days() is None
+
+
+def test_retention_days_falls_back_on_typo(monkeypatch, caplog):
+    monkeypatch.setenv("RETENTION_DAYS", "7d")
+    assert db.retention_days() == 1
+    assert "Invalid RETENTION_DAYS" in caplog.text
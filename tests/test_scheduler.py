@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytz = pytest.importorskip("pytz")
+scheduler = pytest.importorskip("scheduler")
+
+IST = scheduler.IST
+
+
+def at(*args):
+    return IST.localize(datetime(*args))
+
+
+def test_day_of_month_or_weekday_when_both_restricted():
+    # 1st of the month OR any Monday, like cron
+    trigger = scheduler.CronTrigger("0 6 1 * 1")
+    # Thu 1 Oct 2026 -> Mon 5 Oct 2026 -> Mon 12 Oct 2026
+    assert trigger.next_after(at(2026, 9, 30, 12, 0)) == at(2026, 10, 1, 6, 0)
+    assert trigger.next_after(at(2026, 10, 1, 6, 0)) == at(2026, 10, 5, 6, 0)
+    assert trigger.next_after(at(2026, 10, 5, 7, 0)) == at(2026, 10, 12, 6, 0)
+
+
+def test_single_restricted_day_field_still_ands():
+    mondays = scheduler.CronTrigger("0 6 * * 1")
+    assert mondays.next_after(at(2026, 9, 30, 12, 0)) == at(2026, 10, 5, 6, 0)
+    every_other_day = scheduler.CronTrigger("0 6 */2 * 1")
+    assert every_other_day.next_after(at(2026, 10, 1, 0, 0)) == at(2026, 10, 5, 6, 0)
+
+
+def test_previous_before_matches_forward_walk():
+    trigger = scheduler.CronTrigger("*/7 3,15 * * *")
+    moment = at(2026, 10, 18, 15, 30)
+    expected = None
+    candidate = trigger.next_after(moment - timedelta(days=8))
+    while candidate <= moment:
+        expected, candidate = candidate, trigger.next_after(candidate)
+    assert trigger.previous_before(moment) == expected == at(2026, 10, 18, 15, 28)
+    # Exactly on a fire time counts
+    assert trigger.previous_before(at(2026, 10, 18, 3, 0)) == at(2026, 10, 18, 3, 0)
+
+
+def test_previous_before_respects_horizon():
+    trigger = scheduler.CronTrigger("0 6 1 1 *")
+    assert trigger.previous_before(at(2026, 10, 18, 12, 0)) is None
+    assert trigger.previous_before(at(2026, 1, 3, 12, 0)) == at(2026, 1, 1, 6, 0)
@@ -0,0 +1,47 @@
+import json
+import sys
+import threading
+import types
+
+import pytest
+
+pytest.importorskip("deep_translator")
+
+import translator  # noqa: E402
+
+
+@pytest.fixture
+def no_storage(monkeypatch):
+    monkeypatch.setitem(sys.modules, "db", types.SimpleNamespace(save_translations=lambda mapping: None))
+
+
+def test_concurrent_stores_survive_reload(tmp_path, monkeypatch, no_storage):
+    monkeypatch.setattr(translator, "TRANSLATION_MEMORY_COMPACT_EVERY", 7)
+    path = str(tmp_path / "memory.json")
+    memory = translator.TranslationMemory(path)
+
+    def writer(n):
+        for i in range(25):
+            memory.store({f"{n}-{i}": f"text {n} {i}"})
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(path, encoding="utf-8") as f:
+        json.load(f)
+    reloaded = translator.TranslationMemory(path)
+    assert len(reloaded._entries) == 8 * 25
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_torn_journal_line_is_ignored(tmp_path, no_storage):
+    path = str(tmp_path / "memory.json")
+    memory = translator.TranslationMemory(path)
+    memory.store({"a": "A"})
+    with open(memory.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"b": "B"')
+
+    assert translator.TranslationMemory(path)._entries == {"a": "A"}